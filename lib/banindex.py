@@ -0,0 +1,276 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.1.1'
+
+
+### IMPORTS
+import re
+import bisect
+
+from lib.pygeoip import addr_to_num
+
+
+# dotted IPv4 address with optional prefix length, like 1.2.3.0/24
+CIDR_REO = re.compile(r'^\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?$')
+
+
+def is_cidr(text):
+    """
+    check if the text is an IPv4 address or a network in CIDR notation and not e.g. a player name
+
+    @param text: The text to check
+    @type  text: String
+    """
+    return CIDR_REO.match(text) is not None
+
+
+def parse_cidr(cidr):
+    """
+    get the first and the last address of the IPv4 network 'a.b.c.d/bits' as integers, a single address without bits is a /32 network
+
+    @param cidr: The network in CIDR notation
+    @type  cidr: String
+    """
+    address, _, bits = cidr.partition('/')
+    bits = int(bits) if bits else 32
+    if not 0 <= bits <= 32:
+        raise ValueError('%r is not a valid network prefix.' % (cidr,))
+    mask = (0xffffffff << (32 - bits)) & 0xffffffff
+    first = addr_to_num(address.strip()) & mask
+    return first, first | (~mask & 0xffffffff)
+
+
+### CLASS RangeIndex ###
+class RangeIndex(object):
+    """
+    interval index of the IP address ranges of the ban_range table
+
+    The ranges are sorted by their first address. The greatest last address
+    of all ranges up to a position is kept with the ranges, so one bisection
+    finds a range containing an address, also for overlapping ranges.
+    The sorted lists are rebuilt on the next lookup after a change.
+    """
+
+    def __init__(self):
+        """
+        create a new instance of RangeIndex
+        """
+        # range id: (first address, last address, expires)
+        self.ranges = {}
+        self.starts = []
+        # (greatest last address, range id) of the ranges up to the position
+        self.reach = []
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def put(self, range_id, first, last, expires):
+        """
+        add the range or replace the range with the same id
+
+        @param range_id: The id of the range in the ban_range table
+        @type  range_id: Integer
+        @param first: The first address of the range as integer
+        @type  first: Integer
+        @param last: The last address of the range as integer
+        @type  last: Integer
+        @param expires: The expiration date 'YYYY-MM-DD HH:MM:SS'
+        @type  expires: String
+        """
+        self.ranges[range_id] = (first, last, expires)
+        self.dirty = True
+
+    def remove(self, range_id):
+        """
+        remove the range, unknown ids are ignored
+        """
+        if self.ranges.pop(range_id, None) is not None:
+            self.dirty = True
+
+    def remove_expired(self, now):
+        """
+        remove the ranges which expired before now
+        """
+        for range_id in [range_id for range_id, item in self.ranges.iteritems() if item[2] <= now]:
+            self.remove(range_id)
+
+    def rebuild(self):
+        """
+        sort the ranges and compute the greatest last address up to each position
+        """
+        self.starts = []
+        self.reach = []
+        best = (-1, 0)
+        for first, range_id in sorted((item[0], range_id) for range_id, item in self.ranges.iteritems()):
+            last = self.ranges[range_id][1]
+            if last > best[0]:
+                best = (last, range_id)
+            self.starts.append(first)
+            self.reach.append(best)
+        self.dirty = False
+
+    def find(self, ipnum, now):
+        """
+        get the id of an active range containing the address, 0 if there is none
+
+        @param ipnum: The address as integer
+        @type  ipnum: Integer
+        @param now: The current date 'YYYY-MM-DD HH:MM:SS'
+        @type  now: String
+        """
+        if self.dirty:
+            self.rebuild()
+        pos = bisect.bisect_right(self.starts, ipnum) - 1
+        if pos < 0:
+            return 0
+        last, range_id = self.reach[pos]
+        if last < ipnum:
+            return 0
+        if self.ranges[range_id][2] > now:
+            return range_id
+        # the range reaching furthest has expired, it may hide another range containing the address
+        self.remove_expired(now)
+        return self.find(ipnum, now)
+
+
+### CLASS BanIndex ###
+class BanIndex(object):
+    """
+    active bans of the ban_list table by guid and by IP address
+
+    The index is loaded once from the database and has to be updated with
+    every change of the ban_list and ban_range tables. The expiration dates
+    are compared as strings like in the database.
+    """
+
+    def __init__(self):
+        """
+        create a new instance of BanIndex
+        """
+        # ban id: [guid, ip address, expires]
+        self.bans = {}
+        # guid or ip address: set of ban ids
+        self.by_guid = {}
+        self.by_ip = {}
+        # banned IP address ranges
+        self.ranges = RangeIndex()
+
+    def __len__(self):
+        return len(self.bans)
+
+    def load(self, curs, now):
+        """
+        load the bans and the banned ranges which expire after now from the database
+
+        @param curs: The database cursor
+        @type  curs: Instance
+        @param now: The current date 'YYYY-MM-DD HH:MM:SS'
+        @type  now: String
+        """
+        self.bans = {}
+        self.by_guid = {}
+        self.by_ip = {}
+        curs.execute("SELECT `id`,`guid`,`ip_address`,`expires` FROM `ban_list` WHERE `expires` > ?", (now,))
+        for ban_id, guid, ip_address, expires in curs.fetchall():
+            self.put(ban_id, guid, ip_address, expires)
+        self.ranges = RangeIndex()
+        curs.execute("SELECT `id`,`first_ip`,`last_ip`,`expires` FROM `ban_range` WHERE `expires` > ?", (now,))
+        for range_id, first, last, expires in curs.fetchall():
+            self.ranges.put(range_id, first, last, expires)
+
+    def put(self, ban_id, guid, ip_address, expires):
+        """
+        add the ban or replace the ban with the same id
+
+        @param ban_id: The id of the ban in the ban_list table
+        @type  ban_id: Integer
+        @param guid: The guid of the banned player
+        @type  guid: String
+        @param ip_address: The IP address of the banned player
+        @type  ip_address: String
+        @param expires: The expiration date 'YYYY-MM-DD HH:MM:SS'
+        @type  expires: String
+        """
+        self.remove(ban_id)
+        self.bans[ban_id] = [guid, ip_address, expires]
+        self.by_guid.setdefault(guid, set()).add(ban_id)
+        if ip_address:
+            self.by_ip.setdefault(ip_address, set()).add(ban_id)
+
+    def update_guid(self, guid, ip_address, expires=None):
+        """
+        set the IP address and the expiration date of all bans of the guid
+        """
+        for ban_id in list(self.by_guid.get(guid, ())):
+            ban = self.bans[ban_id]
+            self.put(ban_id, guid, ip_address, expires or ban[2])
+
+    def remove(self, ban_id):
+        """
+        remove the ban, unknown ids are ignored
+        """
+        ban = self.bans.pop(ban_id, None)
+        if ban is None:
+            return
+        for key, index in ((ban[0], self.by_guid), (ban[1], self.by_ip)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(ban_id)
+                if not ids:
+                    del index[key]
+
+    def remove_matching(self, guid, ip_address):
+        """
+        remove all bans of the guid or of the IP address
+        """
+        ids = self.by_guid.get(guid, set()) | self.by_ip.get(ip_address, set())
+        for ban_id in ids:
+            self.remove(ban_id)
+
+    def remove_expired(self, now):
+        """
+        remove the bans and the ranges which expired before now
+        """
+        for ban_id in [ban_id for ban_id, ban in self.bans.iteritems() if ban[2] <= now]:
+            self.remove(ban_id)
+        self.ranges.remove_expired(now)
+
+    def find(self, guid, ip_address, now):
+        """
+        get the id of an active ban of the guid or else of the IP address, 0 if the player is not banned
+
+        @param guid: The guid of the player
+        @type  guid: String
+        @param ip_address: The IP address of the player
+        @type  ip_address: String
+        @param now: The current date 'YYYY-MM-DD HH:MM:SS'
+        @type  now: String
+        """
+        for ids in (self.by_guid.get(guid), self.by_ip.get(ip_address)):
+            if ids:
+                active = [ban_id for ban_id in ids if self.bans[ban_id][2] > now]
+                if active:
+                    return min(active)
+        return 0
+
+    def find_range(self, ip_address, now):
+        """
+        get the id of an active banned range containing the IP address, 0 if there is none
+
+        @param ip_address: The IP address of the player
+        @type  ip_address: String
+        @param now: The current date 'YYYY-MM-DD HH:MM:SS'
+        @type  now: String
+        """
+        try:
+            ipnum = addr_to_num(ip_address)
+        except ValueError:
+            return 0
+        return self.ranges.find(ipnum, now)
@@ -0,0 +1,156 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.0.0'
+
+
+### IMPORTS
+import bisect
+
+
+# ranked statistics of the xlrstats table
+STATS = ('ratio', 'kills', 'headshots', 'max_kill_streak')
+
+
+### CLASS Leaderboard ###
+class Leaderboard(object):
+    """
+    players ranked by the value of one statistic, the best first
+
+    The keys (-value, guid) are kept in a sorted list, an update removes
+    and inserts one key by bisection instead of sorting all players.
+    """
+
+    def __init__(self):
+        """
+        create a new instance of Leaderboard
+        """
+        self.keys = []
+        # guid: key of the player in the sorted list
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, guid):
+        return guid in self.positions
+
+    def load(self, values):
+        """
+        rank all players at once
+
+        @param values: The pairs of guid and value
+        @type  values: List
+        """
+        self.positions = dict((guid, (-value, guid)) for guid, value in values)
+        self.keys = sorted(self.positions.itervalues())
+
+    def update(self, guid, value):
+        """
+        set the value of the player
+        """
+        key = (-value, guid)
+        if self.positions.get(guid) == key:
+            return
+        self.remove(guid)
+        bisect.insort(self.keys, key)
+        self.positions[guid] = key
+
+    def remove(self, guid):
+        """
+        remove the player, unknown players are ignored
+        """
+        key = self.positions.pop(guid, None)
+        if key is not None:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def top(self, count):
+        """
+        get the guid and the value of the best players
+        """
+        return [(guid, -value) for value, guid in self.keys[:count]]
+
+    def rank(self, guid):
+        """
+        get the rank of the player starting with 1, None if the player is not ranked
+        """
+        key = self.positions.get(guid)
+        if key is None:
+            return None
+        return bisect.bisect_left(self.keys, key) + 1
+
+
+### CLASS Leaderboards ###
+class Leaderboards(object):
+    """
+    leaderboards of the registered players for all ranked statistics
+    """
+
+    def __init__(self, min_rounds=25):
+        """
+        create a new instance of Leaderboards
+
+        @param min_rounds: The number of rounds a player has to exceed to be ranked by ratio
+        @type  min_rounds: Integer
+        """
+        self.min_rounds = min_rounds
+        self.boards = dict((stat, Leaderboard()) for stat in STATS)
+        self.names = {}
+
+    def load(self, curs):
+        """
+        rank all registered players of the database
+
+        @param curs: The database cursor
+        @type  curs: Instance
+        """
+        curs.execute("SELECT `guid`,`name`,`rounds`,`ratio`,`kills`,`headshots`,`max_kill_streak` FROM `xlrstats`")
+        rows = curs.fetchall()
+        self.names = dict((row[0], row[1]) for row in rows)
+        self.boards['ratio'].load([(row[0], row[3]) for row in rows if row[2] > self.min_rounds])
+        for column, stat in enumerate(STATS[1:], 4):
+            self.boards[stat].load([(row[0], row[column]) for row in rows])
+
+    def update(self, guid, name, rounds, values):
+        """
+        set the statistics of the player
+
+        @param guid: The guid of the player
+        @type  guid: String
+        @param name: The name of the player
+        @type  name: String
+        @param rounds: The number of played rounds
+        @type  rounds: Integer
+        @param values: The values of the ranked statistics by name
+        @type  values: Dictionary
+        """
+        self.names[guid] = name
+        for stat, value in values.iteritems():
+            if stat == 'ratio' and rounds <= self.min_rounds:
+                continue
+            self.boards[stat].update(guid, value)
+
+    def set_name(self, guid, name):
+        """
+        set the name of a ranked player
+        """
+        if guid in self.names:
+            self.names[guid] = name
+
+    def top(self, stat, count):
+        """
+        get the name and the value of the best players of the statistic
+        """
+        return [(self.names[guid], value) for guid, value in self.boards[stat].top(count)]
+
+    def rank(self, stat, guid):
+        """
+        get the rank of the player and the number of ranked players of the statistic
+        """
+        board = self.boards[stat]
+        return board.rank(guid), len(board)
@@ -0,0 +1,230 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.0.1'
+
+
+### IMPORTS
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+
+
+logger = logging.getLogger('spunkybot')
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+
+### CLASS Inotify ###
+class Inotify(object):
+    """
+    minimal ctypes binding of the Linux inotify API
+    """
+
+    def __init__(self):
+        """
+        create a new inotify instance
+
+        @raise OSError: inotify is not supported on this platform
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.add_watch_func = libc.inotify_add_watch
+            self.fd = libc.inotify_init()
+        except (OSError, AttributeError, TypeError):
+            raise OSError('inotify is not available')
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+
+    def add_watch(self, path, mask):
+        """
+        watch the given path for events
+
+        @param path: The path of the file or directory to watch
+        @type  path: String
+        @param mask: The inotify event mask
+        @type  mask: Integer
+        """
+        if self.add_watch_func(self.fd, path, mask) < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % path)
+
+    def read_events(self):
+        """
+        read all pending events and return a list of (mask, name) tuples
+        """
+        events = []
+        data = os.read(self.fd, 8192)
+        pos = 0
+        while pos + 16 <= len(data):
+            _, mask, _, length = struct.unpack('iIII', data[pos:pos + 16])
+            name = data[pos + 16:pos + 16 + length].rstrip('\0')
+            events.append((mask, name))
+            pos += 16 + length
+        return events
+
+    def fileno(self):
+        """
+        file descriptor of the inotify instance
+        """
+        return self.fd
+
+
+### CLASS LogTail ###
+class LogTail(object):
+    """
+    follow a growing log file, notified by inotify or by polling as fallback
+
+    A truncated log file is read again from the beginning, a rotated log file
+    (new inode at the same path) is reopened after the rest of the old file
+    has been read.
+    """
+
+    def __init__(self, filename, poll_interval=.125, max_batch=262144):
+        """
+        create a new instance of LogTail
+
+        @param filename: The full path of the log file
+        @type  filename: String
+        @param poll_interval: Interval in seconds to check for new data if inotify is not available
+        @type  poll_interval: Float
+        @param max_batch: Maximum number of bytes to read at once
+        @type  max_batch: Integer
+        """
+        self.filename = filename
+        self.basename = os.path.basename(filename)
+        self.poll_interval = poll_interval
+        self.max_batch = max_batch
+        self.fd = os.open(filename, os.O_RDONLY)
+        self.offset = 0
+        # incomplete last line of the previous read
+        self.buffer = ''
+        try:
+            self.inotify = Inotify()
+            # watch the directory to get notified when the log file is replaced by a new one
+            self.inotify.add_watch(os.path.dirname(os.path.abspath(filename)),
+                                   IN_MODIFY | IN_CREATE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE)
+        except OSError:
+            self.inotify = None
+
+    def get_backend(self):
+        """
+        get the name of the notification backend
+        """
+        return 'inotify' if self.inotify else 'polling'
+
+    def seek_end(self):
+        """
+        skip all existing data and continue at the end of the file
+        """
+        self.offset = os.lseek(self.fd, 0, os.SEEK_END)
+        self.buffer = ''
+
+    def get_backlog(self):
+        """
+        get the number of bytes written to the log file which have not been read yet
+        """
+        return max(os.fstat(self.fd).st_size - self.offset, 0)
+
+    def read_lines(self):
+        """
+        read the next batch of appended data (at most max_batch bytes) and return the list of complete lines
+        """
+        lines = self.read_data()
+        # switch to a new log file only after the old one has been read completely
+        if not self.get_backlog() and self.reopen_rotated():
+            lines.extend(self.read_data())
+        return lines
+
+    def reopen_rotated(self):
+        """
+        reopen the log file if it has been replaced by a new file
+        """
+        try:
+            file_stat = os.stat(self.filename)
+        except OSError:
+            # log file has been moved away, wait for the new one
+            return False
+        fd_stat = os.fstat(self.fd)
+        if (file_stat.st_ino, file_stat.st_dev) == (fd_stat.st_ino, fd_stat.st_dev):
+            return False
+        try:
+            new_fd = os.open(self.filename, os.O_RDONLY)
+        except OSError:
+            return False
+        os.close(self.fd)
+        self.fd = new_fd
+        self.offset = 0
+        self.buffer = ''
+        logger.info("Game log file rotated : %s reopened", self.filename)
+        return True
+
+    def read_data(self):
+        """
+        read the data appended since the last read and return the list of complete lines
+        """
+        size = os.fstat(self.fd).st_size
+        if size < self.offset:
+            # log file has been truncated, continue at the beginning
+            self.offset = os.lseek(self.fd, 0, os.SEEK_SET)
+            self.buffer = ''
+            logger.info("Game log file truncated: %s read from the beginning", self.filename)
+        if size <= self.offset:
+            return []
+        data = os.read(self.fd, min(size - self.offset, self.max_batch))
+        self.offset += len(data)
+        lines = (self.buffer + data).split('\n')
+        # keep an incomplete line until the rest of it has been written
+        self.buffer = lines.pop()
+        return lines
+
+    def wait(self, timeout):
+        """
+        wait until the log file has been modified or the timeout has expired
+
+        @param timeout: The maximum time to wait in seconds
+        @type  timeout: Float
+        """
+        wait_any([self], timeout)
+
+
+def wait_any(log_tails, timeout):
+    """
+    wait until one of the log files has been modified or the timeout has expired
+
+    @param log_tails: The instances of LogTail
+    @type  log_tails: List
+    @param timeout: The maximum time to wait in seconds
+    @type  timeout: Float
+    """
+    if not all(log_tail.inotify for log_tail in log_tails):
+        time.sleep(min(min(log_tail.poll_interval for log_tail in log_tails), timeout))
+        return
+    basenames = dict((log_tail.inotify, log_tail.basename) for log_tail in log_tails)
+    deadline = time.time() + timeout
+    try:
+        while 1:
+            readable = select.select(list(basenames), [], [], max(deadline - time.time(), 0))[0]
+            if not readable:
+                return
+            for inotify in readable:
+                for mask, name in inotify.read_events():
+                    # ignore events of other files in the same directory
+                    if name == basenames[inotify] or mask & IN_Q_OVERFLOW:
+                        return
+    except (select.error, OSError):
+        pass
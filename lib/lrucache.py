@@ -0,0 +1,115 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.0.0'
+
+
+### IMPORTS
+from threading import Lock
+
+
+### CLASS LRUCache ###
+class LRUCache(object):
+    """
+    dictionary of limited size, the least recently used entry is removed first
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        create a new instance of LRUCache
+
+        @param maxsize: The maximum number of entries
+        @type  maxsize: Integer
+        """
+        self.maxsize = maxsize
+        self.data = {}
+        # circular doubly linked list of [previous, next, key, value] links in order of use,
+        # the root link is the sentinel, root[1] is the least recently used entry
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        """
+        get the value of the key or the default value if the key is not cached
+
+        @param key: The key
+        @type  key: Hashable
+        @param default: The value returned on a cache miss
+        @type  default: Any
+        """
+        with self.lock:
+            link = self.data.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.move_to_end(link)
+            return link[3]
+
+    def put(self, key, value):
+        """
+        store the value of the key, remove the least recently used entry if the cache is full
+
+        @param key: The key
+        @type  key: Hashable
+        @param value: The value
+        @type  value: Any
+        """
+        with self.lock:
+            link = self.data.get(key)
+            if link is not None:
+                link[3] = value
+                self.move_to_end(link)
+                return
+            if len(self.data) >= self.maxsize:
+                oldest = self.root[1]
+                self.root[1] = oldest[1]
+                oldest[1][0] = self.root
+                del self.data[oldest[2]]
+            last = self.root[0]
+            link = [last, self.root, key, value]
+            last[1] = link
+            self.root[0] = link
+            self.data[key] = link
+
+    def move_to_end(self, link):
+        """
+        mark the link as most recently used
+        """
+        link[0][1] = link[1]
+        link[1][0] = link[0]
+        last = self.root[0]
+        last[1] = link
+        link[0] = last
+        link[1] = self.root
+        self.root[0] = link
+
+    def clear(self):
+        """
+        remove all entries and reset the statistics
+        """
+        with self.lock:
+            self.data.clear()
+            self.root[:] = [self.root, self.root, None, None]
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        """
+        get the number of cache hits, cache misses and cached entries
+        """
+        return self.hits, self.misses, len(self.data)
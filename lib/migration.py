@@ -0,0 +1,185 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.3.2'
+
+
+### IMPORTS
+import sqlite3
+
+
+# stats of xlrstats which are added up when rows of the same player are merged
+XLRSTATS_SUMS = ('num_played', 'kills', 'deaths', 'headshots', 'team_kills', 'team_death', 'suicides', 'rounds')
+
+
+def merge_duplicates(connection):
+    """
+    merge the rows of the player and xlrstats tables with the same guid into the oldest row.
+    The name and IP address of the most recent row are kept, the aliases are joined and the stats are added up.
+
+    @param connection: The database connection
+    @type  connection: Instance
+    """
+    for (guid,) in connection.execute('SELECT guid FROM player GROUP BY guid HAVING COUNT(*) > 1').fetchall():
+        rows = connection.execute('SELECT id, name, ip_address, time_joined, aliases FROM player WHERE guid = ? ORDER BY id', (guid,)).fetchall()
+        latest = max(rows, key=lambda row: (row[3] or '', row[0]))
+        aliases = []
+        for row in rows:
+            for alias in (row[4].split(', ') if row[4] else []) + [row[1]]:
+                if alias not in aliases:
+                    aliases.append(alias)
+        connection.execute('UPDATE player SET name = ?, ip_address = ?, time_joined = ?, aliases = ? WHERE id = ?', (latest[1], latest[2], latest[3], ', '.join(aliases), rows[0][0]))
+
+    for (guid,) in connection.execute('SELECT guid FROM xlrstats GROUP BY guid HAVING COUNT(*) > 1').fetchall():
+        rows = connection.execute('SELECT id, name, ip_address, first_seen, last_played, max_kill_streak, admin_role, %s FROM xlrstats WHERE guid = ? ORDER BY id' % ', '.join(XLRSTATS_SUMS), (guid,)).fetchall()
+        latest = max(rows, key=lambda row: (row[4] or '', row[0]))
+        first_seen = min([row[3] for row in rows if row[3]] or [None])
+        sums = dict((column, sum(row[7 + pos] or 0 for row in rows)) for pos, column in enumerate(XLRSTATS_SUMS))
+        ratio = round(float(sums['kills']) / float(sums['deaths']), 2) if sums['deaths'] > 0 else 1.0
+        values = [latest[1], latest[2], first_seen, latest[4], max(row[5] for row in rows), max(row[6] for row in rows), ratio]
+        values.extend(sums[column] for column in XLRSTATS_SUMS)
+        values.append(rows[0][0])
+        connection.execute('UPDATE xlrstats SET name = ?, ip_address = ?, first_seen = ?, last_played = ?, max_kill_streak = ?, admin_role = ?, ratio = ?, %s WHERE id = ?' % ', '.join('%s = ?' % column for column in XLRSTATS_SUMS), values)
+
+
+def copy_aliases(connection):
+    """
+    copy the comma separated aliases of the player table into the alias table
+
+    @param connection: The database connection
+    @type  connection: Instance
+    """
+    rows = connection.execute('SELECT guid, name, time_joined, aliases FROM player ORDER BY id').fetchall()
+    for guid, name, time_joined, aliases in rows:
+        # the list was limited to 15 aliases, the current name may be missing
+        for alias in (aliases.split(', ') if aliases else []) + [name]:
+            # only the current name is known to be seen at the last join
+            seen = time_joined if alias == name else None
+            connection.execute('INSERT OR IGNORE INTO alias (guid, alias, first_seen, last_seen) VALUES (?,?,?,?)', (guid, alias, seen, seen))
+
+
+def create_alias_search(connection):
+    """
+    create the trigram full-text index of the aliases, kept in sync with the alias table by triggers.
+    The index is not created if the sqlite library has no FTS5 trigram tokenizer (sqlite 3.34 and newer).
+
+    @param connection: The database connection
+    @type  connection: Instance
+    """
+    try:
+        connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS alias_search USING fts5(alias, content='alias', content_rowid='id', tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return
+    connection.execute("CREATE TRIGGER IF NOT EXISTS alias_search_insert AFTER INSERT ON alias BEGIN INSERT INTO alias_search (rowid, alias) VALUES (new.id, new.alias); END")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS alias_search_delete AFTER DELETE ON alias BEGIN INSERT INTO alias_search (alias_search, rowid, alias) VALUES ('delete', old.id, old.alias); END")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS alias_search_update AFTER UPDATE OF alias ON alias BEGIN INSERT INTO alias_search (alias_search, rowid, alias) VALUES ('delete', old.id, old.alias); INSERT INTO alias_search (rowid, alias) VALUES (new.id, new.alias); END")
+    connection.execute("INSERT INTO alias_search (alias_search) VALUES ('rebuild')")
+
+
+def has_alias_search(connection):
+    """
+    check if the database has the full-text index of the aliases
+
+    @param connection: The database connection or cursor
+    @type  connection: Instance
+    """
+    return connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'alias_search'").fetchone()[0] > 0
+
+
+# Schema migrations of the database. The version of the database (PRAGMA user_version)
+# is the number of applied migrations, new migrations are appended at the end.
+# A migration step is a SQL statement or a function called with the connection.
+MIGRATIONS = [
+    # 1: tables of Spunky Bot 1.4 and older
+    ['CREATE TABLE IF NOT EXISTS xlrstats (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT NOT NULL, ip_address TEXT NOT NULL, first_seen DATETIME, last_played DATETIME, num_played INTEGER DEFAULT 1, kills INTEGER DEFAULT 0, deaths INTEGER DEFAULT 0, headshots INTEGER DEFAULT 0, team_kills INTEGER DEFAULT 0, team_death INTEGER DEFAULT 0, max_kill_streak INTEGER DEFAULT 0, suicides INTEGER DEFAULT 0, ratio REAL DEFAULT 0, rounds INTEGER DEFAULT 0, admin_role INTEGER DEFAULT 1)',
+     'CREATE TABLE IF NOT EXISTS player (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT NOT NULL, ip_address TEXT NOT NULL, time_joined DATETIME, aliases TEXT)',
+     'CREATE TABLE IF NOT EXISTS ban_list (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT, ip_address TEXT, expires DATETIME DEFAULT 259200, timestamp DATETIME, reason TEXT)',
+     'CREATE TABLE IF NOT EXISTS ban_points (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, point_type TEXT, expires DATETIME)'],
+    # 2: unique guid of players and stats, duplicates are merged into the oldest row, indexes for the lookups
+    [merge_duplicates,
+     'DELETE FROM player WHERE id NOT IN (SELECT MIN(id) FROM player GROUP BY guid)',
+     'DELETE FROM xlrstats WHERE id NOT IN (SELECT MIN(id) FROM xlrstats GROUP BY guid)',
+     'CREATE UNIQUE INDEX IF NOT EXISTS player_guid ON player (guid)',
+     'CREATE UNIQUE INDEX IF NOT EXISTS xlrstats_guid ON xlrstats (guid)',
+     'CREATE INDEX IF NOT EXISTS xlrstats_admin_role ON xlrstats (admin_role)',
+     'CREATE INDEX IF NOT EXISTS xlrstats_ratio ON xlrstats (ratio)',
+     'CREATE INDEX IF NOT EXISTS ban_list_guid ON ban_list (guid)',
+     'CREATE INDEX IF NOT EXISTS ban_list_ip_address ON ban_list (ip_address)',
+     'CREATE INDEX IF NOT EXISTS ban_list_expires ON ban_list (expires)',
+     'CREATE INDEX IF NOT EXISTS ban_points_guid_expires ON ban_points (guid, expires)',
+     'CREATE INDEX IF NOT EXISTS ban_points_expires ON ban_points (expires)',
+     'ANALYZE'],
+    # 3: banned IP address ranges, the first and the last address as integers
+    ['CREATE TABLE IF NOT EXISTS ban_range (id INTEGER PRIMARY KEY NOT NULL, first_ip INTEGER NOT NULL, last_ip INTEGER NOT NULL, cidr TEXT NOT NULL, name TEXT, expires DATETIME, timestamp DATETIME, reason TEXT)',
+     'CREATE INDEX IF NOT EXISTS ban_range_expires ON ban_range (expires)'],
+    # 4: aliases of the players in their own table, player.aliases is no longer updated
+    ['CREATE TABLE IF NOT EXISTS alias (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, alias TEXT NOT NULL, first_seen DATETIME, last_seen DATETIME)',
+     'CREATE UNIQUE INDEX IF NOT EXISTS alias_guid_alias ON alias (guid, alias)',
+     'CREATE INDEX IF NOT EXISTS alias_alias ON alias (alias)',
+     copy_aliases],
+    # 5: full-text index of the aliases for substring and similarity searches, skipped without FTS5 trigram support
+    [create_alias_search],
+]
+
+
+def get_version(connection):
+    """
+    get the schema version of the database
+
+    @param connection: The database connection
+    @type  connection: Instance
+    """
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply(connection, statements, version=None):
+    """
+    apply the steps of a migration in one transaction, the schema version is set if given
+
+    @param connection: The database connection
+    @type  connection: Instance
+    @param statements: The SQL statements and functions of the migration
+    @type  statements: List
+    @param version: The schema version after the migration
+    @type  version: Integer
+    """
+    connection.execute('BEGIN')
+    try:
+        for statement in statements:
+            if callable(statement):
+                statement(connection)
+            else:
+                connection.execute(statement)
+        if version is not None:
+            connection.execute('PRAGMA user_version = %d' % version)
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def migrate(connection):
+    """
+    apply all missing migrations, each migration in its own transaction, and return the schema version.
+    The full-text index of the aliases is created on every start while it is missing, e.g. after an upgrade of the sqlite library.
+
+    @param connection: The database connection
+    @type  connection: Instance
+    """
+    version = get_version(connection)
+    # the sqlite3 module commits before each CREATE statement, control the transactions explicitly
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None
+    try:
+        for version in xrange(version, len(MIGRATIONS)):
+            apply(connection, MIGRATIONS[version], version + 1)
+        if not has_alias_search(connection):
+            apply(connection, [create_alias_search])
+    finally:
+        connection.isolation_level = isolation_level
+    return get_version(connection)
@@ -8,8 +8,12 @@ http://python-geoip.googlecode.com/hg/pygeoip.py
 __author__ = 'David Wilson <dw@botanicus.net>'
 
 import os
+import sys
+import mmap
+import bisect
+import struct
 
-from cStringIO import StringIO
+from array import array
 
 # From GeoIP.h.
 SEGMENT_RECORD_LENGTH = 3
@@ -38,6 +42,12 @@ STATE_BEGIN_REV1 = 16000000
 STRUCTURE_INFO_MAX_SIZE = 20
 DATABASE_INFO_MAX_SIZE = 100
 
+# Compiled country index: range starts, prefix lengths and country values.
+INDEX_VERSION = 1
+INDEX_TYPECODES = ('I' if array('I').itemsize >= 4 else 'L', 'B', 'H')
+# Every INDEX_BLOCK-th range start of the mapped index is kept in memory.
+INDEX_BLOCK = 256
+
 GeoIP_country_code = '''
     AP EU AD AE AF AG AI AL AM AN AO AQ AR AS AT AU AW AZ BA BB BD BE BF BG BH
     BI BJ BM BN BO BR BS BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR
@@ -178,10 +188,10 @@ class ReadBuffer(object):
     buffer = None
 
     def __init__(self, source, size, seek_offset=None, seek_whence=os.SEEK_SET):
-        fp = StringIO(source)
-        if seek_offset is not None:
-            fp.seek(seek_offset, seek_whence)
-        self.buffer = fp.read(size)
+        start = seek_offset or 0
+        if seek_whence == os.SEEK_END:
+            start += len(source)
+        self.buffer = source[start:start + size]
 
     def read_string(self):
         '''
@@ -250,23 +260,95 @@ class BigAddressInfo(AddressInfo):
                (self.ip, self.network, self.prefix, self.city, self.country)
 
 
+class CountryIndex(object):
+    '''
+    Compiled country index mapped read-only from its cache file, processes
+    using the same file share its pages. Only every INDEX_BLOCK-th range start
+    is kept in memory to find the block of an address, the range starts of
+    that block are copied from the file and bisected.
+    '''
+
+    def __init__(self, fp, count):
+        '''
+        Map the index file.
+
+        @param[in]  fp      Index file positioned after the header.
+        @param[in]  count   Number of ranges in the file.
+        '''
+        self.count = count
+        self.sizes = tuple(array(typecode).itemsize for typecode in INDEX_TYPECODES)
+        self.offsets = []
+        offset = fp.tell()
+        for size in self.sizes:
+            self.offsets.append(offset)
+            offset += size * count
+        self.map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if offset != len(self.map) or not count:
+            self.map.close()
+            raise ValueError('Index file has a wrong size')
+        self.blocks = self.starts(0, count)[::INDEX_BLOCK]
+        # native formats of the prefix lengths and country values
+        self.formats = tuple('=' + typecode for typecode in INDEX_TYPECODES)
+
+    def starts(self, first, last):
+        '''
+        Copy the range starts first to last - 1 into an array.
+        '''
+        size = self.sizes[0]
+        offset = self.offsets[0]
+        return array(INDEX_TYPECODES[0], self.map[offset + first * size:offset + last * size])
+
+    def find(self, ipnum):
+        '''
+        Find the range containing an address.
+
+        @param[in]  ipnum   IPv4 address as an integer.
+        @returns            Tuple (prefix length, country value).
+        '''
+        sizes, offsets, formats, cache = self.sizes, self.offsets, self.formats, self.map
+        first = (bisect.bisect_right(self.blocks, ipnum) - 1) * INDEX_BLOCK
+        last = min(first + INDEX_BLOCK, self.count)
+        starts = array(INDEX_TYPECODES[0], cache[offsets[0] + first * sizes[0]:offsets[0] + last * sizes[0]])
+        i = first + bisect.bisect_right(starts, ipnum) - 1
+        return (struct.unpack_from(formats[1], cache, offsets[1] + i * sizes[1])[0],
+                struct.unpack_from(formats[2], cache, offsets[2] + i * sizes[2])[0])
+
+    def close(self):
+        '''
+        Unmap the index file.
+        '''
+        self.map.close()
+
+
 class Database(object):
     '''
     GeoIP database reader implementation. Currently only supports country
     edition.
     '''
 
-    def __init__(self, filename):
+    def __init__(self, filename, use_mmap=False, use_index=False, index_filename=None):
         '''
         Initialize a new GeoIP reader instance.
 
         @param[in]  filename    Path to GeoIP.dat as a string.
+        @param[in]  use_mmap    Map the file read-only instead of reading it,
+                                processes using the same file share its pages.
+        @param[in]  use_index   Look up countries by bisecting a compiled index
+                                cached in a file, which is mapped read-only.
+        @param[in]  index_filename  Path of the index cache file, default:
+                                <filename>.idx.
         '''
         self.filename = filename
+        self.index_filename = index_filename or filename + '.idx'
         self.segments = None
         self.db_type = None
         self.record_length = None
-        self.cache = open(filename, 'rb').read()
+        self.index = None
+        with open(filename, 'rb') as db_file:
+            if use_mmap:
+                self.cache = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.cache = db_file.read()
         self._setup_segments()
 
         if self.db_type not in (GEOIP_COUNTRY_EDITION,
@@ -275,22 +357,24 @@ class Database(object):
             raise NotImplementedError('Database edition is not supported yet; '
                                       'Please use a Country or City database.')
 
+        if use_index and self.db_type == GEOIP_COUNTRY_EDITION:
+            self.load_index()
+
     def _setup_segments(self):
         # default to GeoIP Country Edition
         self.db_type = GEOIP_COUNTRY_EDITION
         self.record_length = STANDARD_RECORD_LENGTH
 
-        fp = StringIO(self.cache)
-        fp.seek(-3, os.SEEK_END)
+        cache = self.cache
+        pos = len(cache) - 3
 
         for i in range(STRUCTURE_INFO_MAX_SIZE):
-            delim = fp.read(3)
-
-            if delim != '\xFF\xFF\xFF':
-                fp.seek(-4, os.SEEK_CUR)
+            if cache[pos:pos + 3] != '\xFF\xFF\xFF':
+                pos -= 1
                 continue
 
-            self.db_type = ord(fp.read(1))
+            self.db_type = ord(cache[pos + 3])
+            pos += 4
 
             # Region Edition, pre June 2003.
             if self.db_type == GEOIP_REGION_EDITION_REV0:
@@ -307,7 +391,7 @@ class Database(object):
                                   GEOIP_ASNUM_EDITION):
                 self.segments = [0]
 
-                for idx, ch in enumerate(fp.read(SEGMENT_RECORD_LENGTH)):
+                for idx, ch in enumerate(cache[pos:pos + SEGMENT_RECORD_LENGTH]):
                     self.segments[0] += ord(ch) << (idx * 8)
 
                 if self.db_type in (GEOIP_ORG_EDITION, GEOIP_ISP_EDITION):
@@ -325,60 +409,143 @@ class Database(object):
 
         @returns    English text string, or None if database is ancient.
         '''
-        fp = StringIO(self.cache)
-        fp.seek(-3, os.SEEK_END)
+        cache = self.cache
+        pos = len(cache) - 3
 
         hasStructureInfo = False
 
         # first get past the database structure information
         for i in range(STRUCTURE_INFO_MAX_SIZE):
-            if fp.read(3) == '\xFF\xFF\xFF':
+            if cache[pos:pos + 3] == '\xFF\xFF\xFF':
                 hasStructureInfo = True
                 break
 
-            fp.seek(-4, os.SEEK_CUR)
+            pos -= 1
 
         if hasStructureInfo:
-            fp.seek(-6, os.SEEK_CUR)
+            pos -= 3
         else:
             # no structure info, must be pre Sep 2002 database, go back to end.
-            fp.seek(-3, os.SEEK_END)
+            pos = len(cache) - 3
 
         for i in range(DATABASE_INFO_MAX_SIZE):
-            if fp.read(3) == '\0\0\0':
-                return fp.read(i)
+            if cache[pos:pos + 3] == '\0\0\0':
+                return cache[pos + 3:pos + 3 + i]
+
+            pos -= 1
+
+    def load_index(self):
+        '''
+        Map the compiled country index from its cache file, build it and store
+        it there first if the cache file is missing or the database file has
+        changed. Without a writable cache file the tree is walked instead.
+        '''
+        index_file = self.index_filename
+        stat = os.stat(self.filename)
+        signature = 'pygeoip-index %d %s %d %d\n' % (INDEX_VERSION, sys.byteorder, stat.st_size, int(stat.st_mtime))
+
+        self.index = self._map_index(index_file, signature)
+        if self.index:
+            return
+
+        # write to a temporary file first, other processes may read the cache
+        temp_file = '%s.%d' % (index_file, os.getpid())
+        try:
+            with open(temp_file, 'wb') as fp:
+                fp.write(signature)
+                columns = self._build_index()
+                fp.write('%d\n' % len(columns[0]))
+                for column in columns:
+                    column.tofile(fp)
+            os.rename(temp_file, index_file)
+        except (IOError, OSError):
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return
+        self.index = self._map_index(index_file, signature)
+
+    def _map_index(self, index_file, signature):
+        '''
+        Map the index cache file if it belongs to the database file.
 
-            fp.seek(-4, os.SEEK_CUR)
+        @returns    CountryIndex instance or None.
+        '''
+        try:
+            with open(index_file, 'rb') as fp:
+                if fp.readline() == signature:
+                    return CountryIndex(fp, int(fp.readline()))
+        except (EnvironmentError, ValueError):
+            pass
+        return None
 
-    def _decode(self, buf, branch):
+    def _build_index(self):
         '''
-        @param[in]  buf         Record buffer.
-        @param[in]  branch      1 for left, 2 for right.
-        @returns                X.
+        Walk the whole tree once and collect its leaves in ascending order.
+
+        @returns    Tuple of arrays (range starts, prefix lengths, country
+                    values), adjacent leaves with the same prefix length and
+                    country are merged.
         '''
-        offset = 3 * branch
-        if self.record_length == 3:
-            return buf[offset] | (buf[offset + 1] << 8) | (buf[offset + 2] << 16)
+        cache = self.cache
+        segment = self.segments[0]
+        starts, prefixes, values = tuple(array(typecode) for typecode in INDEX_TYPECODES)
+
+        # (record offset, depth, range start, leaf value or None)
+        stack = [(0, 31, 0, None)]
+        while stack:
+            offset, depth, base, leaf = stack.pop()
+            if leaf is not None:
+                if not values or values[-1] != leaf or prefixes[-1] != 32 - depth:
+                    starts.append(base)
+                    prefixes.append(32 - depth)
+                    values.append(leaf)
+                continue
 
-        # General case.
-        end = branch * self.record_length
-        x = 0
+            pos = STANDARD_RECORD_LENGTH * 2 * offset
+            # right branch first, the left branch is taken from the stack first
+            for branch in (1, 0):
+                p = pos + branch * STANDARD_RECORD_LENGTH
+                x = ord(cache[p]) | (ord(cache[p + 1]) << 8) | (ord(cache[p + 2]) << 16)
+                start = base | (branch << depth)
+                if x >= segment:
+                    stack.append((x, depth, start, x - segment))
+                elif depth:
+                    stack.append((x, depth - 1, start, None))
 
-        for j in range(self.record_length):
-            x = (x << 8) | buf[end - j]
+        return starts, prefixes, values
 
-        return x
+    def close(self):
+        '''
+        Release the database buffer, unmap the file in mmap mode and the index.
+        '''
+        if isinstance(self.cache, mmap.mmap):
+            self.cache.close()
+        if self.index:
+            self.index.close()
+        self.cache = None
+        self.index = None
 
     def _seek_record(self, ipnum):
-        fp = StringIO(self.cache)
+        # walk the tree by indexing directly into the database buffer
+        cache = self.cache
+        record_length = self.record_length
+        segment = self.segments[0]
         offset = 0
 
-        for depth in range(31, -1, -1):
-            fp.seek(self.record_length * 2 * offset)
-            buf = map(ord, fp.read(self.record_length * 2))
+        for depth in xrange(31, -1, -1):
+            pos = record_length * 2 * offset
+            if ipnum & (1 << depth):
+                pos += record_length
+
+            if record_length == 3:
+                x = ord(cache[pos]) | (ord(cache[pos + 1]) << 8) | (ord(cache[pos + 2]) << 16)
+            else:
+                # General case, little-endian record.
+                x = 0
+                for j in xrange(pos + record_length - 1, pos - 1, -1):
+                    x = (x << 8) | ord(cache[j])
 
-            x = self._decode(buf, int(bool(ipnum & (1 << depth))))
-            if x >= self.segments[0]:
+            if x >= segment:
                 return 32 - depth, x
 
             offset = x
@@ -391,9 +558,12 @@ class Database(object):
         "Lookup a country db entry."
 
         ipnum = addr_to_num(ip)
-        prefix, num = self._seek_record(ipnum)
+        if self.index:
+            prefix, num = self.index.find(ipnum)
+        else:
+            prefix, num = self._seek_record(ipnum)
+            num -= COUNTRY_BEGIN
 
-        num -= COUNTRY_BEGIN
         if num:
             country_id = num - 1
         else:
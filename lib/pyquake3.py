@@ -19,6 +19,7 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
 import socket
+import time
 import re
 
 
@@ -50,6 +51,13 @@ class PyQuake3(object):
     """
     packet_prefix = '\xff' * 4
     player_reo = re.compile(r'^(\d+) (\d+) "(.*)"')
+    challenge_reo = re.compile(r'\\challenge\\([^\\\n]*)')
+    # the server sends the RCON output in packets of up to 1008 bytes (SV_OUTPUTBUF_LENGTH),
+    # a packet is sent as soon as the next line would not fit anymore
+    output_buffer_length = 1008
+    max_line_length = 128
+    # lower limit of the adaptive response timeout in seconds
+    min_timeout = .25
 
     rcon_password = None
     port = None
@@ -57,13 +65,19 @@ class PyQuake3(object):
     players = None
     values = None
 
-    def __init__(self, server, rcon_password=''):
+    def __init__(self, server, rcon_password='', limiter=None):
         """
-        create a new instance of PyQuake3
+        create a new instance of PyQuake3, the optional limiter paces the sent packets with its acquire() method
         """
+        self.limiter = limiter
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.set_server(server)
         self.set_rcon_password(rcon_password)
+        # smoothed round trip time, its variation and the resulting response timeout
+        self.srtt = None
+        self.rttvar = None
+        self.rto = 1
+        self.challenge = 0
 
     def set_server(self, server):
         """
@@ -92,6 +106,8 @@ class PyQuake3(object):
         """
         send packet
         """
+        if self.limiter is not None:
+            self.limiter.acquire()
         self.sock.send('%s%s\n' % (self.packet_prefix, data))
 
     def recv(self, timeout=1):
@@ -104,26 +120,84 @@ class PyQuake3(object):
         except socket.error, err:
             raise Exception('Error receiving the packet: %s' % err[1])
 
-    def command(self, cmd, timeout=1, retries=5):
+    def flush(self):
+        """
+        discard received packets, e.g. late responses to previous commands
+        """
+        self.sock.settimeout(0)
+        try:
+            while 1:
+                self.sock.recv(8192)
+        except socket.error:
+            pass
+
+    def update_rtt(self, rtt):
+        """
+        update the response timeout with the measured round trip time (RFC 6298)
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = .75 * self.rttvar + .25 * abs(self.srtt - rtt)
+            self.srtt = .875 * self.srtt + .125 * rtt
+        self.rto = self.srtt + 4 * self.rttvar
+
+    def command(self, cmd, timeout=1, retries=5, response_type=None, match=None):
         """
         send command and receive response
+
+        Packets of another response type or not accepted by match are discarded.
+        The command is sent again if no response is received within the adaptive
+        timeout, which is doubled with every retry up to the given timeout.
         """
-        while retries:
+        self.flush()
+        rto = min(max(self.rto, self.min_timeout), timeout)
+        for attempt in xrange(retries):
             self.send_packet(cmd)
+            # measure the round trip time without the wait of the limiter
+            sent = time.time()
+            deadline = sent + rto
+            while 1:
+                try:
+                    data = self.recv(max(deadline - time.time(), .001))
+                    r_type, r_data = self.parse_packet(data)
+                except Exception:
+                    if time.time() < deadline:
+                        # malformed packet
+                        continue
+                    break
+                if (response_type and r_type != response_type) or (match and not match(r_data)):
+                    continue
+                # round trip time of retransmitted commands is ambiguous (Karn's algorithm)
+                if attempt == 0:
+                    self.update_rtt(time.time() - sent)
+                if r_type == 'print':
+                    r_data += self.recv_continuation(r_data)
+                return r_type, r_data
+            rto = min(rto * 2, timeout)
+        raise Exception('Server response timed out')
+
+    def recv_continuation(self, data):
+        """
+        receive the remaining packets of a print response which was split by the server
+        """
+        rest = []
+        while len(data) > self.output_buffer_length - self.max_line_length:
             try:
-                data = self.recv(timeout)
+                r_type, data = self.parse_packet(self.recv(max(self.rto, self.min_timeout)))
             except Exception:
-                data = None
-            if data:
-                return self.parse_packet(data)
-            retries -= 1
-        raise Exception('Server response timed out')
+                break
+            if r_type != 'print':
+                break
+            rest.append(data)
+        return ''.join(rest)
 
     def rcon(self, cmd):
         """
         send RCON command
         """
-        r_cmd = self.command('rcon "%s" %s' % (self.rcon_password, cmd))
+        r_cmd = self.command('rcon "%s" %s' % (self.rcon_password, cmd), response_type='print')
         if r_cmd[1] == 'No rconpassword set on the server.\n' or r_cmd[1] == 'Bad rconpassword.\n':
             raise Exception(r_cmd[1][:-1])
         return r_cmd
@@ -178,8 +252,17 @@ class PyQuake3(object):
         """
         get status
         """
-        data = self.command('getstatus')[1]
+        # the server returns the challenge in the response
+        self.challenge += 1
+        challenge = str(self.challenge)
+
+        def match(data):
+            found = self.challenge_reo.search(data)
+            return not found or found.group(1) == challenge
+
+        data = self.command('getstatus %s' % challenge, response_type='statusResponse', match=match)[1]
         self.values = self.parse_status(data)
+        self.values.pop('challenge', None)
 
     def rcon_update(self):
         """
@@ -6,26 +6,95 @@ Author: Alexander Kress
 This program is released under the MIT License.
 """
 
-__version__ = '1.0.9'
+__version__ = '1.1.6'
 
 
 ### IMPORTS
+import re
 import time
 import os.path
+import itertools
 
 from lib.pyquake3 import PyQuake3
-from Queue import Queue
+from Queue import PriorityQueue, Empty
 from threading import Thread
+from threading import Lock
 from threading import RLock
 
 
+### CLASS RateLimiter ###
+class RateLimiter(object):
+    """
+    token bucket to pace the packets sent to the server
+
+    ioq3 limits the connectionless packets of an address with SVC_RateLimitAddress(from, 10, 1000),
+    a burst of 10 packets, then one packet per second. Dropped packets are not answered.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        create a new instance of RateLimiter
+
+        @param rate: Number of commands per second, 0 disables the rate limit
+        @type  rate: Float
+        @param burst: Number of commands which can be sent without delay, default: one second of commands
+        @type  burst: Integer
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.last = time.time()
+        # the bot and the RCON processor thread send packets
+        self.lock = Lock()
+
+    def refill(self):
+        """
+        refill the bucket for the time passed since the last refill, the caller holds the lock
+        """
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + max(now - self.last, 0) * self.rate)
+        self.last = now
+
+    def wait(self):
+        """
+        wait until the next command can be sent, without taking its token
+        """
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self.refill()
+            delay = (1 - self.tokens) / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+    def acquire(self):
+        """
+        wait until the next command can be sent and take its token
+        """
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self.refill()
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
 ### CLASS Rcon ###
 class Rcon(object):
     """
     RCON class
     """
 
-    def __init__(self, host, port, passwd):
+    # priority of the commands, lower values are sent first: enforcement, interactive replies (default), broadcast
+    cmd_priority = {'kick': 0, 'forceteam': 0, 'mute': 0, 'say': 2, 'bigtext': 2}
+    # commands which can be merged into one RCON packet
+    mergeable_cmds = ('say', 'tell')
+    # color codes of the server output, e.g. '^7'
+    color_reo = re.compile(r'\^[0-9a-zA-Z]')
+
+    def __init__(self, host, port, passwd, rate=1, coalesce=False, burst=10):
         """
         create a new instance of Rcon
 
@@ -35,11 +104,24 @@ class Rcon(object):
         @type  port: String
         @param passwd: The RCON password
         @type  passwd: String
+        @param rate: Maximum number of packets sent to the server per second
+        @type  rate: Float
+        @param coalesce: Merge queued say and tell commands separated by ';' into one RCON packet
+        @type  coalesce: bool
+        @param burst: Number of packets which can be sent without delay
+        @type  burst: Integer
         """
         self.live = False
-        self.quake = PyQuake3("%s:%s" % (host, port), passwd)
-        self.queue = Queue()
+        # all packets are paced, also the queries and the retransmissions of PyQuake3
+        self.limiter = RateLimiter(rate, burst)
+        self.quake = PyQuake3("%s:%s" % (host, port), passwd, self.limiter)
+        self.queue = PriorityQueue()
+        # sequence number to keep the order of commands with the same priority
+        self.sequence = itertools.count()
         self.rcon_lock = RLock()
+        self.coalesce = coalesce
+        # the server truncates command lines longer than MAX_STRING_CHARS (1024) including password
+        self.max_length = 1023 - len('rcon "%s" ' % passwd)
         # start Thread
         self.processor = Thread(target=self.process)
         self.processor.setDaemon(True)
@@ -54,7 +136,7 @@ class Rcon(object):
         """
         if self.live:
             with self.rcon_lock:
-                self.queue.put(msg)
+                self.queue.put((self.cmd_priority.get(msg.split(' ', 1)[0], 1), next(self.sequence), msg))
 
     def go_live(self):
         """
@@ -89,14 +171,72 @@ class Rcon(object):
         """
         get CVAR value
         """
-        if self.live:
-            with self.rcon_lock:
-                try:
-                    ret_val = self.quake.rcon(value)[1].split(':')[1].split('^7')[0].lstrip('"')
-                except IndexError:
-                    ret_val = None
-                time.sleep(.33)
-                return ret_val
+        return self.get_cvars(value)[value]
+
+    def get_cvars(self, *names, **kwargs):
+        """
+        get the values of several CVARs at once, return a dictionary with None for unknown CVARs
+
+        The queries are sent without waiting for each other and the answers are
+        assigned by the CVAR name. Only unanswered queries are sent again, after
+        an increasing delay, as the server drops queries when throttling.
+        When every query of a round got an answer, the CVARs without a matching
+        answer are unknown, e.g. the server answered with an empty print.
+
+        @param names: The names of the CVARs
+        @type  names: String
+        @param timeout: Time in seconds to wait for the answers, default: 1
+        @type  timeout: Float
+        @param retries: Number of attempts for unanswered queries, default: 5
+        @type  retries: Integer
+        @param max_wait: Maximum time in seconds for all attempts, default: 3
+        @type  max_wait: Float
+        """
+        timeout = kwargs.get('timeout', 1)
+        retries = kwargs.get('retries', 5)
+        values = dict.fromkeys(names)
+        if not self.live:
+            return values
+        # the server prints the CVAR name in its own spelling
+        pending = dict((name.lower(), name) for name in names)
+        delay = .25
+        end = time.time() + kwargs.get('max_wait', 3)
+        with self.rcon_lock:
+            while pending and retries:
+                # discard late answers of the previous round, they would be counted for this round
+                self.quake.flush()
+                for name in pending.itervalues():
+                    self.quake.send_packet('rcon "%s" %s' % (self.quake.rcon_password, name))
+                sent = len(pending)
+                answers = 0
+                deadline = min(time.time() + timeout, end)
+                while pending and answers < sent:
+                    try:
+                        data = self.quake.recv(max(deadline - time.time(), .001))
+                        response = self.quake.parse_packet(data)[1]
+                    except Exception:
+                        break
+                    if response in ('No rconpassword set on the server.\n', 'Bad rconpassword.\n'):
+                        raise Exception(response[:-1])
+                    answers += 1
+                    # '"name" is:"value^7" default:"value^7"' or 'Unknown command "name^7"'
+                    name = self.color_reo.sub('', response.split('"')[1]).lower() if response.count('"') > 1 else None
+                    if name in pending:
+                        try:
+                            values[pending.pop(name)] = response.split(':')[1].split('^7')[0].lstrip('"') if ' is:' in response else None
+                        except IndexError:
+                            pending.pop(name)
+                if answers >= sent:
+                    # all queries answered, the remaining CVARs are unknown
+                    break
+                retries -= 1
+                if pending and retries:
+                    if time.time() + delay >= end:
+                        break
+                    # server did not answer all queries, wait before sending them again
+                    time.sleep(delay)
+                    delay *= 2
+        return values
 
     def get_mapcycle_path(self):
         """
@@ -104,12 +244,12 @@ class Rcon(object):
         """
         maplist = []
         self.quake.rcon_update()
-        # get path of fs_homepath and fs_basepath
-        fs_homepath = self.get_cvar('fs_homepath')
-        fs_basepath = self.get_cvar('fs_basepath')
-        fs_game = self.get_cvar('fs_game')
-        # get file name of mapcycle.txt
-        mapcycle_file = self.get_cvar('g_mapcycle')
+        # get path of fs_homepath and fs_basepath and the file name of mapcycle.txt
+        cvars = self.get_cvars('fs_homepath', 'fs_basepath', 'fs_game', 'g_mapcycle')
+        fs_homepath = cvars['fs_homepath']
+        fs_basepath = cvars['fs_basepath']
+        fs_game = cvars['fs_game']
+        mapcycle_file = cvars['g_mapcycle']
         try:
             # set full path of mapcycle.txt
             mc_home_path = os.path.join(fs_homepath, fs_game, mapcycle_file)
@@ -142,21 +282,55 @@ class Rcon(object):
         Thread process
         """
         while 1:
-            if not self.queue.empty():
-                if self.live:
-                    with self.rcon_lock:
-                        try:
-                            command = self.queue.get()
-                            if command != 'status':
-                                self.quake.rcon(command)
-                            else:
-                                self.quake.rcon_update()
-                        except Exception:
-                            pass
-            time.sleep(.33)
+            # wait for the send interval first to pick the command with the highest priority queued in the meantime
+            self.limiter.wait()
+            command = self.next_command()
+            if self.live:
+                with self.rcon_lock:
+                    try:
+                        if command != 'status':
+                            self.quake.rcon(command)
+                        else:
+                            self.quake.rcon_update()
+                    except Exception:
+                        pass
+
+    def next_command(self):
+        """
+        get the command with the highest priority, merge queued say and tell commands if coalescing is enabled
+        """
+        # block until the next command is pushed
+        command = self.queue.get()[2]
+        if not self.coalesce or not self.is_mergeable(command):
+            return command
+        batch = [command]
+        length = len(command)
+        while 1:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            command = item[2]
+            if not self.is_mergeable(command) or length + len(command) + 1 > self.max_length:
+                # put it back with its priority and sequence number to be sent next
+                self.queue.put(item)
+                break
+            batch.append(command)
+            length += len(command) + 1
+        return ';'.join(batch)
+
+    def is_mergeable(self, command):
+        """
+        check if the command can be merged with other commands
+
+        @param command: The RCON command
+        @type  command: String
+        """
+        return ';' not in command and command.split(' ', 1)[0] in self.mergeable_cmds
 
     def clear(self):
         """
         clear RCON queue
         """
-        self.queue.queue.clear()
+        with self.queue.mutex:
+            del self.queue.queue[:]
@@ -0,0 +1,255 @@
+"""
+Library for Spunky Bot
+http://www.spunkybot.de
+Author: Alexander Kress
+
+This program is released under the MIT License.
+"""
+
+__version__ = '1.0.0'
+
+
+### IMPORTS
+import time
+import sqlite3
+import logging
+
+from threading import Thread
+from threading import Lock
+from threading import Condition
+
+
+logger = logging.getLogger('spunkybot')
+
+# statements which are written in the background
+MUTATIONS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+### CLASS WriteBehind ###
+class WriteBehind(object):
+    """
+    sqlite connection committing the changes in a writer thread
+
+    INSERT, UPDATE and DELETE statements are queued and the writer thread
+    commits all statements queued within the delay in one transaction.
+    A query first executes the queued statements on the same connection, so
+    the bot reads its own writes before they are committed. Statements of the
+    last delay are lost if the bot is killed before close() is called.
+
+    The database is used in WAL mode with synchronous=NORMAL, so a commit only
+    appends to the write-ahead log and a query never waits for a disk sync.
+    The writer thread syncs the log into the database file with a checkpoint
+    on its own connection, without holding the lock of the queries.
+    """
+
+    def __init__(self, database, delay=1.0):
+        """
+        create a new instance of WriteBehind
+
+        @param database: The path of the database file
+        @type  database: String
+        @param delay: Time in seconds to collect statements for one transaction
+        @type  delay: Float
+        """
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.db_cursor = self.connection.cursor()
+        self.delay = delay
+        # serializes the use of the connection by the bot and the writer thread
+        self.lock = Lock()
+        # connection of the checkpoints, None if the database has no write-ahead log (in-memory database)
+        self.checkpoints = None
+        self.checkpoint_lock = Lock()
+        if self.connection.execute('PRAGMA journal_mode = WAL').fetchone()[0].lower() == 'wal':
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+            self.connection.execute('PRAGMA wal_autocheckpoint = 0')
+            self.checkpoints = sqlite3.connect(database, check_same_thread=False)
+        # queued statements and state of the transaction, guarded by the condition
+        self.condition = Condition()
+        self.pending = []
+        self.uncommitted = False
+        self.closed = False
+        self.statements = 0
+        self.transactions = 0
+        # start Thread
+        self.writer = Thread(target=self.process)
+        self.writer.setDaemon(True)
+        self.writer.start()
+
+    def cursor(self):
+        """
+        get a new cursor
+        """
+        return Cursor(self)
+
+    def enqueue(self, sql, params=()):
+        """
+        queue the statement for the writer thread
+        """
+        with self.condition:
+            self.pending.append((sql, params))
+            self.condition.notify()
+
+    def commit(self):
+        """
+        wake up the writer thread, the transaction is committed in the background
+        """
+        with self.condition:
+            self.condition.notify()
+
+    def query(self, sql, params=()):
+        """
+        execute the queued statements and the query, return all rows of the result
+        """
+        with self.lock:
+            self.apply()
+            return self.db_cursor.execute(sql, params).fetchall()
+
+    def last_insert_id(self):
+        """
+        execute the queued statements and return the row id of the last inserted row
+        """
+        with self.lock:
+            self.apply()
+            return self.db_cursor.lastrowid
+
+    def apply(self):
+        """
+        execute the queued statements without committing them, the caller holds the lock
+        """
+        with self.condition:
+            pending, self.pending = self.pending, []
+            if pending:
+                self.uncommitted = True
+        for sql, params in pending:
+            try:
+                self.db_cursor.execute(sql, params)
+            except sqlite3.Error as err:
+                logger.error("Database statement failed: %s: %s", err, sql)
+        self.statements += len(pending)
+
+    def flush(self):
+        """
+        execute the queued statements, commit the transaction and write the log into the database file
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.apply()
+            with self.condition:
+                if not self.uncommitted:
+                    return
+                self.uncommitted = False
+            try:
+                self.connection.commit()
+                self.transactions += 1
+            except sqlite3.Error as err:
+                # keep the transaction open, the commit is retried with the next statements
+                logger.error("Database commit failed: %s", err)
+                with self.condition:
+                    self.uncommitted = True
+                return
+        self.checkpoint()
+
+    def checkpoint(self):
+        """
+        copy the committed transactions of the write-ahead log into the database file and sync it to disk
+        """
+        if self.checkpoints is None:
+            return
+        with self.checkpoint_lock:
+            try:
+                self.checkpoints.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            except sqlite3.Error as err:
+                logger.error("Database checkpoint failed: %s", err)
+
+    def process(self):
+        """
+        Thread process
+        """
+        while 1:
+            with self.condition:
+                while not self.pending and not self.uncommitted and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            # collect the statements following the first one into the same transaction
+            time.sleep(self.delay)
+            try:
+                self.flush()
+            except Exception as err:
+                logger.error("Database writer failed: %s", err)
+
+    def get_stats(self):
+        """
+        get the number of executed statements and committed transactions
+        """
+        return self.statements, self.transactions
+
+    def close(self):
+        """
+        commit the queued statements, stop the writer thread and close the connection
+        """
+        self.flush()
+        with self.lock:
+            with self.condition:
+                self.closed = True
+                self.condition.notify()
+        # the writer thread must not outlive the connection
+        self.writer.join()
+        self.connection.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+
+
+### CLASS Cursor ###
+class Cursor(object):
+    """
+    cursor of WriteBehind, the rows of a query are fetched at once
+    """
+
+    def __init__(self, connection):
+        """
+        create a new instance of Cursor
+
+        @param connection: The connection
+        @type  connection: Instance
+        """
+        self.connection = connection
+        self.rows = []
+        self.position = 0
+
+    def execute(self, sql, params=()):
+        """
+        queue a statement changing the database or execute a query
+        """
+        if sql.lstrip().split(None, 1)[0].upper() in MUTATIONS:
+            self.connection.enqueue(sql, params)
+            self.rows = []
+        else:
+            self.rows = self.connection.query(sql, params)
+        self.position = 0
+        return self
+
+    def fetchone(self):
+        """
+        get the next row of the query or None
+        """
+        if self.position >= len(self.rows):
+            return None
+        self.position += 1
+        return self.rows[self.position - 1]
+
+    def fetchall(self):
+        """
+        get the remaining rows of the query
+        """
+        rows = self.rows[self.position:]
+        self.position = len(self.rows)
+        return rows
+
+    @property
+    def lastrowid(self):
+        """
+        row id of the last inserted row
+        """
+        return self.connection.last_insert_id()
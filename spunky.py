@@ -30,8 +30,8 @@ import os
 import re
 import sys
 import time
-import sqlite3
 import math
+import signal
 import textwrap
 import urllib
 import urllib2
@@ -40,9 +40,15 @@ import ConfigParser
 import logging.handlers
 import lib.pygeoip as pygeoip
 import lib.schedule as schedule
+import lib.migration as migration
 
 from lib.rcon import Rcon
 from lib.rules import Rules
+from lib.logtail import LogTail, wait_any
+from lib.lrucache import LRUCache
+from lib.banindex import BanIndex, is_cidr, parse_cidr
+from lib.leaderboard import Leaderboards
+from lib.writebehind import WriteBehind
 from threading import RLock
 
 
@@ -54,6 +60,83 @@ logger.propagate = False
 # Bot player number
 BOT_PLAYER_NUM = 1022
 
+# Country of recently connected IP addresses, players reconnect on every map change
+COUNTRY_CACHE = LRUCache(4096)
+
+# Active bans by guid and IP address, loaded at startup and updated with the ban_list table
+BAN_INDEX = BanIndex()
+
+# Registered players ranked by ratio, kills, headshots and max kill streak, updated with the xlrstats table
+LEADERBOARD = Leaderboards()
+
+
+### CLASS Log Event ###
+class LogEvent(object):
+    """
+    event of the game log file, the numeric fields are tokenized in a single pass on first use
+    """
+    __slots__ = ('timestamp', 'action', 'data', 'tokens')
+    # leading numeric fields, the last one may be terminated by a colon, followed by the payload
+    numbers_reo = re.compile(r'(\d+(?: \d+)*)(?::? |:?$)')
+    # player numbers, hit zones, weapons and means of death are looked up instead of calling int()
+    number_values = dict((str(number), number) for number in xrange(1024))
+
+    def __init__(self, timestamp, action, data):
+        """
+        create a new instance of LogEvent
+
+        @param timestamp: The game time of the event, e.g. '12:34'
+        @type  timestamp: String
+        @param action: The action of the event, e.g. 'Kill'
+        @type  action: String
+        @param data: The data following the action, e.g. '2 4 19: Player2 killed Player4 by UT_MOD_LR300'
+        @type  data: String
+        """
+        self.timestamp = timestamp
+        self.action = action
+        self.data = data
+        # numbers and payload, None until the first use
+        self.tokens = None
+
+    @property
+    def numbers(self):
+        """
+        leading numeric fields of the data, e.g. [2, 4, 19]
+        """
+        tokens = self.tokens
+        if tokens is None:
+            tokens = self.tokenize()
+        return tokens[0]
+
+    @property
+    def payload(self):
+        """
+        data following the numeric fields, e.g. 'Player2 killed Player4 by UT_MOD_LR300'
+        """
+        tokens = self.tokens
+        if tokens is None:
+            tokens = self.tokenize()
+        return tokens[1]
+
+    def tokenize(self):
+        """
+        split the data into the numeric fields and the payload
+        """
+        head, separator, payload = self.data.partition(': ')
+        # most events are 'numbers: payload', e.g. Hit and Kill
+        if separator:
+            try:
+                self.tokens = (map(self.number_values.__getitem__, head.split(' ')), payload)
+                return self.tokens
+            except KeyError:
+                pass
+        match = self.numbers_reo.match(self.data)
+        if match:
+            self.tokens = ([int(number) for number in match.group(1).split(' ')], self.data[match.end():])
+        else:
+            self.tokens = ([], self.data)
+        return self.tokens
+
 
 ### CLASS Log Parser ###
 class LogParser(object):
@@ -94,7 +177,10 @@ class LogParser(object):
         self.fulladmin_cmds = self.admin_cmds + ['ban', 'baninfo', 'ci', 'scream', 'slap', 'swap', 'version', 'veto']
         self.senioradmin_cmds = self.fulladmin_cmds + ['banlist', 'cyclemap', 'kill', 'kiss', 'lookup',
                                                        'makereg', 'map', 'maps', 'maprestart', 'moon',
-                                                       'permban', 'putgroup', 'setnextmap', 'unban', 'ungroup']
+                                                       'permban', 'putgroup', 'rangeban', 'rangeunban', 'setnextmap',
+                                                       'unban', 'ungroup']
+        # arguments of !xlrtopstats and the ranked statistics
+        self.ranked_stats = {'ratio': 'ratio', 'kills': 'kills', 'hs': 'headshots', 'streak': 'max_kill_streak'}
         # alphabetic sort of the commands
         self.mod_cmds.sort()
         self.admin_cmds.sort()
@@ -120,9 +206,10 @@ class LogParser(object):
         devel_log.setLevel(logging.INFO)
         devel_log.setFormatter(formatter)
 
-        # add logging handler
-        logger.addHandler(console)
-        logger.addHandler(devel_log)
+        # add logging handler, only once if several servers are administered
+        if not logger.handlers:
+            logger.addHandler(console)
+            logger.addHandler(devel_log)
 
         logger.info("*** Spunky Bot v%s : www.spunkybot.de ***", __version__)
         logger.info("Starting logging      : OK")
@@ -133,7 +220,9 @@ class LogParser(object):
         self.log_file = open(games_log, 'r')
         # go to the end of the file
         self.log_file.seek(0, 2)
-        logger.info("Parsing Gamelog file  : %s", games_log)
+        # follow the game log file
+        self.log_tail = LogTail(games_log)
+        logger.info("Parsing Gamelog file  : %s (%s)", games_log, self.log_tail.get_backend())
 
         self.ffa_lms_gametype = False
         self.ctf_gametype = False
@@ -148,6 +237,7 @@ class LogParser(object):
         self.players_lock = RLock()
         self.firstblood = False
         self.firstnadekill = False
+        self.build_dispatch_table()
 
         # enable/disable autokick for team killing
         self.tk_autokick = config.getboolean('bot', 'teamkill_autokick') if config.has_option('bot', 'teamkill_autokick') else True
@@ -175,6 +265,8 @@ class LogParser(object):
         # enable/disable option to get Head Admin by checking existence of head admin in database
         curs.execute("SELECT COUNT(*) FROM `xlrstats` WHERE `admin_role` = 100")
         self.iamgod = True if curs.fetchone()[0] < 1 else False
+        # search the players with the full-text index of the aliases, if sqlite supports it
+        self.alias_search = migration.has_alias_search(curs)
         logger.info("Connecting to Database: OK")
         # Master Server
         self.base_url = 'http://master.spunkybot.de'
@@ -184,9 +276,6 @@ class LogParser(object):
         values = urllib.urlencode(data)
         self.ping_url = '%s/ping.php?%s' % (self.base_url, values)
 
-        # start parsing the games logfile
-        self.read_log()
-
     def find_game_start(self):
         """
         find InitGame start
@@ -252,6 +341,12 @@ class LogParser(object):
         """
         read the logfile
         """
+        read_logs([self])
+
+    def start(self):
+        """
+        schedule the tasks, create the game and continue at the end of the logfile
+        """
         if self.task_frequency > 0:
             # schedule the task
             if self.task_frequency < 10:
@@ -269,16 +364,25 @@ class LogParser(object):
         # create instance of Game
         self.game = Game(self.config_file, self.urt42_modversion)
 
-        self.log_file.seek(0, 2)
-        while self.log_file:
-            schedule.run_pending()
-            line = self.log_file.readline()
-            if len(line) != 0:
-                self.parse_line(line)
-            else:
-                if not self.game.live:
-                    self.game.go_live()
-                time.sleep(.125)
+        self.log_file.close()
+        self.log_tail.seek_end()
+
+    def parse_log(self):
+        """
+        parse the next batch of lines of the logfile, return False if there was nothing to parse
+        """
+        lines = self.log_tail.read_lines()
+        parse_line = self.parse_line
+        for line in lines:
+            parse_line(line)
+        backlog = self.log_tail.get_backlog()
+        if backlog:
+            logger.debug("Catching up, %d bytes of the game log %s are not parsed yet", backlog, self.log_tail.filename)
+        elif not lines:
+            if not self.game.live:
+                self.game.go_live()
+            return False
+        return True
 
     def send_heartbeat(self):
         """
@@ -291,13 +395,14 @@ class LogParser(object):
 
     def remove_expired_db_entries(self):
         """
-        delete expired ban points
+        delete expired ban points and remove expired bans from the ban index
         """
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
         values = (timestamp,)
         # remove expired ban_points
         curs.execute("DELETE FROM `ban_points` WHERE `expires` < ?", values)
         conn.commit()
+        BAN_INDEX.remove_expired(timestamp)
 
     def taskmanager(self):
         """
@@ -400,30 +505,33 @@ class LogParser(object):
                     else:
                         gameplayer.clear_high_ping()
 
+    def build_dispatch_table(self):
+        """
+        map the actions of the log file to their handlers
+        """
+        self.dispatch = {'InitGame': self.new_game, 'Warmup': self.handle_warmup, 'InitRound': self.handle_initround,
+                         'Exit': self.handle_exit, 'say': self.handle_say, 'saytell': self.handle_saytell,
+                         'ClientUserinfo': self.handle_userinfo, 'ClientUserinfoChanged': self.handle_userinfo_changed,
+                         'ClientBegin': self.handle_begin, 'ClientDisconnect': self.handle_disconnect,
+                         'SurvivorWinner': self.handle_survivor_winner, 'Kill': self.handle_kill, 'Hit': self.handle_hit,
+                         'Freeze': self.handle_freeze, 'ThawOutFinished': self.handle_thawout,
+                         'Flag': self.handle_flag, 'FlagCaptureTime': self.handle_flagcapturetime}
+        # actions without colon are identified by their first word, e.g. 'Bomb was planted by 2!' or 'Pop!'
+        self.dispatch_prefix = {'Bomb': self.handle_bomb, 'Bombholder': self.handle_bomb,
+                                'Pop': self.handle_bomb_exploded}
+
     def parse_line(self, string):
         """
         parse the logfile and search for specific action
         """
-        line = string[7:]
-        tmp = line.split(":", 1)
-        line = tmp[1].strip() if len(tmp) > 1 else tmp[0].strip()
-        option = {'InitGame': self.new_game, 'Warmup': self.handle_warmup, 'InitRound': self.handle_initround,
-                  'Exit': self.handle_exit, 'say': self.handle_say, 'saytell': self.handle_saytell,
-                  'ClientUserinfo': self.handle_userinfo, 'ClientUserinfoChanged': self.handle_userinfo_changed,
-                  'ClientBegin': self.handle_begin, 'ClientDisconnect': self.handle_disconnect,
-                  'SurvivorWinner': self.handle_teams_ts_mode, 'Kill': self.handle_kill, 'Hit': self.handle_hit,
-                  'Freeze': self.handle_freeze, 'ThawOutFinished': self.handle_thawout,
-                  'Flag': self.handle_flag, 'FlagCaptureTime': self.handle_flagcapturetime}
-
+        action, separator, data = string[7:].partition(':')
+        action = action.strip()
         try:
-            if tmp:
-                action = tmp[0].strip()
-                if action in option:
-                    option[action](line)
-                elif 'Bomb' in action:
-                    self.handle_bomb(line)
-                elif 'Pop' in action:
-                    self.handle_bomb_exploded()
+            handler = self.dispatch.get(action)
+            if handler is None:
+                handler = self.dispatch_prefix.get(action.split(' ', 1)[0].rstrip('!'))
+            if handler is not None:
+                handler(LogEvent(string[:7].strip(), action, data.strip() if separator else action))
         except (IndexError, KeyError):
             pass
         except Exception as err:
@@ -447,10 +555,11 @@ class LogParser(object):
                 key = True
         return values
 
-    def new_game(self, line):
+    def new_game(self, event):
         """
         set-up a new game
         """
+        line = event.data
         self.ffa_lms_gametype = True if ('g_gametype\\0\\' in line or 'g_gametype\\1\\' in line or 'g_gametype\\9\\' in line or 'g_gametype\\11\\' in line) else False
         self.ctf_gametype = True if 'g_gametype\\7\\' in line else False
         self.ts_gametype = True if ('g_gametype\\4\\' in line or 'g_gametype\\5\\' in line) else False
@@ -458,6 +567,7 @@ class LogParser(object):
         self.bomb_gametype = True if 'g_gametype\\8\\' in line else False
         self.freeze_gametype = True if 'g_gametype\\10\\' in line else False
         logger.debug("InitGame: Starting game...")
+        logger.debug("GeoIP cache: %d hits, %d misses, %d addresses", *COUNTRY_CACHE.get_stats())
         self.game.rcon_clear()
         # reset the player stats
         self.stats_reset()
@@ -471,24 +581,22 @@ class LogParser(object):
         if self.support_lowgravity:
             self.game.send_rcon("set g_gravity %d" % self.gravity)
 
-    def handle_flagcapturetime(self, line):
+    def handle_flagcapturetime(self, event):
         """
         handle flag capture time
         """
-        tmp = line.split(": ", 1)
-        player_num = int(tmp[0])
-        action = tmp[1]
-        if action.isdigit():
-            cap_time = round(float(action) / 1000, 2)
+        player_num = event.numbers[0]
+        if event.payload.isdigit():
+            cap_time = round(float(event.payload) / 1000, 2)
             logger.debug("Player %d captured the flag in %s seconds", player_num, cap_time)
             with self.players_lock:
                 self.game.players[player_num].set_flag_capture_time(cap_time)
 
-    def handle_warmup(self, line):
+    def handle_warmup(self, event):
         """
         handle warmup
         """
-        logger.debug("Warmup... %s", line)
+        logger.debug("Warmup... %s", event.data)
         self.allow_cmd_teams = True
 
     def handle_initround(self, _):
@@ -504,11 +612,11 @@ class LogParser(object):
             if self.allow_cmd_teams_round_end:
                 self.allow_cmd_teams = False
 
-    def handle_exit(self, line):
+    def handle_exit(self, event):
         """
         handle Exit of a match, show Awards, store user score in database and reset statistics
         """
-        logger.debug("Exit: %s", line)
+        logger.debug("Exit: %s", event.data)
         self.handle_awards()
         self.allow_cmd_teams = True
         self.stats_reset(store_score=True)
@@ -535,14 +643,13 @@ class LogParser(object):
             self.firstblood = False
             self.firstnadekill = False
 
-    def handle_userinfo(self, line):
+    def handle_userinfo(self, event):
         """
         handle player user information, auto-kick known cheater ports or guids
         """
         with self.players_lock:
-            player_num = int(line[:2].strip())
-            line = line[2:].lstrip("\\").lstrip()
-            values = self.explode_line(line)
+            player_num = event.numbers[0]
+            values = self.explode_line(event.payload)
             challenge = True if 'challenge' in values else False
             try:
                 guid = values['cl_guid'].rstrip('\n')
@@ -572,8 +679,11 @@ class LogParser(object):
                 self.game.add_player(player)
                 # kick banned player
                 player_ban_id = self.game.players[player_num].get_ban_id()
+                player_range_ban_id = self.game.players[player_num].get_range_ban_id()
                 if player_ban_id:
                     self.kick_player_reason("^7%s ^1banned ^7(ID @%d)" % (name, player_ban_id), player_num)
+                elif player_range_ban_id:
+                    self.kick_player_reason("^7%s ^1banned ^7(range ID @%d)" % (name, player_range_ban_id), player_num)
                 else:
                     if self.show_country_on_connect:
                         self.game.rcon_say("^7%s ^7connected from %s" % (name, self.game.players[player_num].get_country()))
@@ -605,16 +715,15 @@ class LogParser(object):
         self.game.send_rcon("kick %d" % player_num)
         self.game.send_rcon(reason)
 
-    def handle_userinfo_changed(self, line):
+    def handle_userinfo_changed(self, event):
         """
         handle player changes
         """
         with self.players_lock:
-            player_num = int(line[:2].strip())
+            player_num = event.numbers[0]
             player = self.game.players[player_num]
-            line = line[2:].lstrip("\\")
             try:
-                values = self.explode_line(line)
+                values = self.explode_line(event.payload)
                 team_num = int(values['t'])
                 player.set_team(team_num)
                 name = re.sub(r"\s+", "", values['n'])
@@ -634,12 +743,12 @@ class LogParser(object):
                 self.game.rcon_tell(player_num, "^3You are forced to: ^7%s" % team_lock)
             logger.debug("ClientUserinfoChanged: Player %d %s joined team %s", player_num, name, Player.teams[team_num])
 
-    def handle_begin(self, line):
+    def handle_begin(self, event):
         """
         handle player entering game
         """
         with self.players_lock:
-            player_num = int(line)
+            player_num = event.numbers[0]
             player = self.game.players[player_num]
             player_name = player.get_name()
             # Welcome message for registered players
@@ -649,30 +758,30 @@ class LogParser(object):
                 player.disable_welcome_msg()
             logger.debug("ClientBegin: Player %d %s has entered the game", player_num, player_name)
 
-    def handle_disconnect(self, line):
+    def handle_disconnect(self, event):
         """
         handle player disconnect
         """
         with self.players_lock:
-            player_num = int(line)
+            player_num = event.numbers[0]
             player = self.game.players[player_num]
             player.save_info()
             player.reset()
             del self.game.players[player_num]
             logger.debug("ClientDisconnect: Player %d %s has left the game", player_num, player.get_name())
 
-    def handle_hit(self, line):
+    def handle_hit(self, event):
         """
         handle all kind of hits
         """
         with self.players_lock:
-            info = line.split(":", 1)[0].split()
-            hitter_id = int(info[1])
-            victim_id = int(info[0])
+            info = event.numbers
+            hitter_id = info[1]
+            victim_id = info[0]
             hitter = self.game.players[hitter_id]
             hitter_name = hitter.get_name()
-            hitpoint = int(info[2])
-            hit_item = int(info[3])
+            hitpoint = info[2]
+            hit_item = info[3]
             # increase summary of all hits
             hitter.set_all_hits()
 
@@ -693,20 +802,18 @@ class LogParser(object):
                     hitter.set_hitzones(zones[self.hit_points[hitpoint]])
                 logger.debug("Player %d %s hit %d %s in the %s with %s", hitter_id, hitter_name, victim_id, self.game.players[victim_id].get_name(), self.hit_points[hitpoint], self.hit_item[hit_item])
 
-    def handle_kill(self, line):
+    def handle_kill(self, event):
         """
         handle kills
         """
         with self.players_lock:
-            parts = line.split(":", 1)
-            info = parts[0].split()
-            k_name = parts[1].split()[0]
-            killer_id = int(info[0])
-            victim_id = int(info[1])
-            death_cause = self.death_cause[int(info[2])]
+            info = event.numbers
+            killer_id = info[0]
+            victim_id = info[1]
+            death_cause = self.death_cause[info[2]]
             victim = self.game.players[victim_id]
 
-            if k_name == "<non-client>":
+            if event.payload.startswith("<non-client> "):
                 # killed by World
                 killer_id = BOT_PLAYER_NUM
             killer = self.game.players[killer_id]
@@ -755,7 +862,7 @@ class LogParser(object):
                 victim.die()
                 logger.debug("Player %d %s committed suicide with %s", victim_id, victim_name, death_cause)
             # kill counter
-            elif not tk_event and int(info[2]) != 10:  # 10: MOD_CHANGE_TEAM
+            elif not tk_event and info[2] != 10:  # 10: MOD_CHANGE_TEAM
                 killer.kill()
 
                 # first kill message
@@ -874,14 +981,14 @@ class LogParser(object):
         else:
             return True, map_list[0], None
 
-    def handle_saytell(self, line):
+    def handle_saytell(self, event):
         """
         handle saytell commands
         """
-        tmp = line.strip()
+        tmp = event.data
         try:
             new = tmp[0] + ''.join(tmp[3:])
-            self.handle_say(new)
+            self.handle_say(LogEvent(event.timestamp, 'say', new))
         except IndexError:
             pass
 
@@ -910,7 +1017,7 @@ class LogParser(object):
                 pass
         return clean_list
 
-    def handle_say(self, line):
+    def handle_say(self, event):
         """
         handle say commands
         """
@@ -928,7 +1035,7 @@ class LogParser(object):
                        'name': 'do not use offensive names'}
 
         with self.players_lock:
-            line = line.strip()
+            line = event.data
             try:
                 divider = line.split(": ", 1)
                 number = divider[0].split(" ", 1)[0]
@@ -1066,22 +1173,32 @@ class LogParser(object):
                             if player.get_registered_user():
                                 ratio = round(float(player.get_db_kills()) / float(player.get_db_deaths()), 2) if player.get_db_deaths() > 0 else 1.0
                                 self.game.rcon_tell(sar['player_num'], "^7Stats %s: ^7K ^2%d ^7D ^3%d ^7TK ^1%d ^7Ratio ^5%s ^7HS ^2%d" % (player.get_name(), player.get_db_kills(), player.get_db_deaths(), player.get_db_tks(), ratio, player.get_db_headshots()))
+                                self.tell_rank(sar['player_num'], player)
                             else:
                                 self.game.rcon_tell(sar['player_num'], "^7Sorry, this player is not registered")
                 else:
                     if self.game.players[sar['player_num']].get_registered_user():
                         ratio = round(float(self.game.players[sar['player_num']].get_db_kills()) / float(self.game.players[sar['player_num']].get_db_deaths()), 2) if self.game.players[sar['player_num']].get_db_deaths() > 0 else 1.0
                         self.game.rcon_tell(sar['player_num'], "^7Stats %s: ^7K ^2%d ^7D ^3%d ^7TK ^1%d ^7Ratio ^5%s ^7HS ^2%d" % (self.game.players[sar['player_num']].get_name(), self.game.players[sar['player_num']].get_db_kills(), self.game.players[sar['player_num']].get_db_deaths(), self.game.players[sar['player_num']].get_db_tks(), ratio, self.game.players[sar['player_num']].get_db_headshots()))
+                        self.tell_rank(sar['player_num'], self.game.players[sar['player_num']])
                     else:
                         self.game.rcon_tell(sar['player_num'], "^7You need to ^2!register ^7first")
 
             # xlrtopstats
             elif (sar['command'] == '!xlrtopstats' or sar['command'] == '!topstats') and self.game.players[sar['player_num']].get_admin_role() >= 1:
-                curs.execute("SELECT name FROM `xlrstats` WHERE `rounds` > 25 ORDER BY `ratio` DESC LIMIT 3")
-                result = curs.fetchall()
-                toplist = ['^1#%s ^7%s' % (index + 1, result[index][0]) for index in xrange(len(result))]
-                msg = "^3Top players: %s" % str(", ".join(toplist)) if toplist else "^3Awards still available"
-                self.game.rcon_tell(sar['player_num'], msg)
+                arg = line.split(sar['command'])[1].strip().lower()
+                if arg and arg not in self.ranked_stats:
+                    self.game.rcon_tell(sar['player_num'], "^7Usage: !xlrtopstats [ratio|kills|hs|streak]")
+                else:
+                    stat = self.ranked_stats[arg] if arg else 'ratio'
+                    result = LEADERBOARD.top(stat, 3)
+                    if stat == 'ratio':
+                        toplist = ['^1#%s ^7%s' % (index + 1, result[index][0]) for index in xrange(len(result))]
+                        msg = "^3Top players: %s" % str(", ".join(toplist)) if toplist else "^3Awards still available"
+                    else:
+                        toplist = ['^1#%s ^7%s ^7(^2%d^7)' % (index + 1, result[index][0], result[index][1]) for index in xrange(len(result))]
+                        msg = "^3Top players by %s: %s" % (arg, str(", ".join(toplist))) if toplist else "^3Awards still available"
+                    self.game.rcon_tell(sar['player_num'], msg)
 
             # forgive last team kill
             elif sar['command'] == '!forgiveprev' or sar['command'] == '!fp' or sar['command'] == '!f':
@@ -1729,8 +1846,19 @@ class LogParser(object):
                     arg = line.split(sar['command'])[1].strip()
                     search = '%' + arg + '%'
                     lookup = (search,)
-                    curs.execute("SELECT * FROM `player` WHERE `name` like ? ORDER BY `time_joined` DESC LIMIT 8", lookup)
+                    # search the current names and the aliases of all players
+                    if self.alias_search:
+                        curs.execute("SELECT * FROM `player` WHERE `guid` IN (SELECT a.`guid` FROM `alias_search` s JOIN `alias` a ON a.`id` = s.`rowid` WHERE s.`alias` like ?) ORDER BY `time_joined` DESC LIMIT 8", lookup)
+                    else:
+                        curs.execute("SELECT * FROM `player` WHERE `guid` IN (SELECT `guid` FROM `alias` WHERE `alias` like ?) ORDER BY `time_joined` DESC LIMIT 8", lookup)
                     result = curs.fetchall()
+                    if not result and self.alias_search and len(arg) > 3:
+                        # no substring match, search for aliases sharing the most trigrams with the name
+                        lookup = (' OR '.join('"%s"' % arg[pos:pos + 3].replace('"', '""') for pos in xrange(len(arg) - 2)),)
+                        curs.execute("SELECT p.* FROM (SELECT a.`guid`,MIN(s.`rank`) AS `score` FROM `alias_search` s JOIN `alias` a ON a.`id` = s.`rowid` WHERE `alias_search` MATCH ? GROUP BY a.`guid` ORDER BY `score` LIMIT 8) m JOIN `player` p ON p.`guid` = m.`guid` ORDER BY m.`score`", lookup)
+                        result = curs.fetchall()
+                        if result:
+                            self.game.rcon_tell(sar['player_num'], "^7No Player found matching %s, similar names:" % arg)
                     for row in result:
                         self.game.rcon_tell(sar['player_num'], "^7[^2@%s^7] %s ^7[^1%s^7]" % (str(row[0]), str(row[2]), str(row[4])), False)  # 0=ID, 1=GUID, 2=Name, 3=IP, 4=Date
                     if not result:
@@ -1860,10 +1988,12 @@ class LogParser(object):
                             ip_addr = str(result[2])
                             curs.execute("DELETE FROM `ban_list` WHERE `id` = ?", values)
                             conn.commit()
+                            BAN_INDEX.remove(values[0])
                             self.game.rcon_tell(sar['player_num'], "^7Player ^2%s ^7unbanned" % name)
                             values = (guid, ip_addr)
                             curs.execute("DELETE FROM `ban_list` WHERE `guid` = ? OR ip_address = ?", values)
                             conn.commit()
+                            BAN_INDEX.remove_matching(guid, ip_addr)
                             self.game.rcon_tell(sar['player_num'], "^7Try to remove duplicates of [^1%s^7]" % ip_addr)
                         else:
                             self.game.rcon_tell(sar['player_num'], "^7Invalid ID, no Player found")
@@ -1872,6 +2002,74 @@ class LogParser(object):
                 else:
                     self.game.rcon_tell(sar['player_num'], "^7Usage: !unban <@ID>")
 
+            # rangeban - ban an IP address range permanent
+            elif (sar['command'] == '!rangeban' or sar['command'] == '!rb') and self.game.players[sar['player_num']].get_admin_role() >= 80:
+                if line.split(sar['command'])[1]:
+                    arg = line.split(sar['command'])[1].split()
+                    if len(arg) > 1:
+                        target = arg[0]
+                        reason = ' '.join(arg[1:])[:40].strip()
+                        admin = self.game.players[sar['player_num']]
+                        name = None
+                        if not is_cidr(target):
+                            # ban the /24 network of the player, names may start with a digit
+                            found, victim, msg = self.player_found(target)
+                            if found:
+                                name = victim.get_name()
+                                target = "%s/24" % victim.get_ip_address()
+                            else:
+                                target = None
+                                self.game.rcon_tell(sar['player_num'], msg)
+                        if target:
+                            try:
+                                first, last = parse_cidr(target)
+                            except ValueError:
+                                first = last = None
+                            # do not ban networks larger than /16
+                            if first is None or last - first > 65535:
+                                self.game.rcon_tell(sar['player_num'], "^7Invalid range ^3%s^7, use a network from /16 to /32" % target)
+                            else:
+                                cidr = "%s/%d" % (pygeoip.num_to_addr(first), 32 - bin(last - first).count('1'))
+                                # ban for 20 years
+                                expire_date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() + 630720000))
+                                timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
+                                values = (first, last, cidr, name, expire_date, timestamp, "%s, ban by %s" % (reason, admin.get_name()))
+                                curs.execute("INSERT INTO `ban_range` (`first_ip`,`last_ip`,`cidr`,`name`,`expires`,`timestamp`,`reason`) VALUES (?,?,?,?,?,?,?)", values)
+                                conn.commit()
+                                range_id = curs.lastrowid
+                                BAN_INDEX.ranges.put(range_id, first, last, expire_date)
+                                self.game.rcon_tell(sar['player_num'], "^7Range ^2%s ^1banned ^7(range ID @%d)" % (cidr, range_id))
+                                # kick the connected players of the range
+                                for player in self.game.players.itervalues():
+                                    if player.get_player_num() == BOT_PLAYER_NUM or player.get_admin_role() >= admin.get_admin_role():
+                                        continue
+                                    if BAN_INDEX.find_range(player.get_ip_address(), timestamp) == range_id:
+                                        self.game.kick_player(player.get_player_num(), reason=reason)
+                    else:
+                        self.game.rcon_tell(sar['player_num'], "^7You need to enter a reason: ^3!rangeban <name|range> <reason>")
+                else:
+                    self.game.rcon_tell(sar['player_num'], "^7Usage: !rangeban <name|range> <reason>")
+
+            # rangeunban - unban an IP address range via ID
+            elif sar['command'] == '!rangeunban' and self.game.players[sar['player_num']].get_admin_role() >= 80:
+                if line.split(sar['command'])[1]:
+                    arg = line.split(sar['command'])[1].strip().lstrip('@')
+                    if arg.isdigit():
+                        values = (int(arg),)
+                        curs.execute("SELECT `cidr` FROM `ban_range` WHERE `id` = ?", values)
+                        result = curs.fetchone()
+                        if result:
+                            curs.execute("DELETE FROM `ban_range` WHERE `id` = ?", values)
+                            conn.commit()
+                            BAN_INDEX.ranges.remove(values[0])
+                            self.game.rcon_tell(sar['player_num'], "^7Range ^2%s ^7unbanned" % str(result[0]))
+                        else:
+                            self.game.rcon_tell(sar['player_num'], "^7Invalid ID, no range found")
+                    else:
+                        self.game.rcon_tell(sar['player_num'], "^7Usage: !rangeunban <@ID>")
+                else:
+                    self.game.rcon_tell(sar['player_num'], "^7Usage: !rangeunban <@ID>")
+
 ## head admin level 100
             # ungroup - remove the admin level from a player
             elif sar['command'] == '!ungroup' and self.game.players[sar['player_num']].get_admin_role() == 100:
@@ -1892,6 +2090,10 @@ class LogParser(object):
 ## iamgod
             # iamgod - register user as Head Admin
             elif sar['command'] == '!iamgod':
+                if self.iamgod:
+                    # all game servers share the database, another server may have registered a Head Admin already
+                    curs.execute("SELECT COUNT(*) FROM `xlrstats` WHERE `admin_role` = 100")
+                    self.iamgod = curs.fetchone()[0] < 1
                 if self.iamgod:
                     if not self.game.players[sar['player_num']].get_registered_user():
                         # register new user in DB and set admin role to 100
@@ -1908,6 +2110,14 @@ class LogParser(object):
                 else:
                     self.game.rcon_tell(sar['player_num'], "^7Unknown command ^3%s" % sar['command'])
 
+    def tell_rank(self, player_num, player):
+        """
+        display the rank of the player by ratio
+        """
+        rank, total = LEADERBOARD.rank('ratio', player.get_guid())
+        if rank:
+            self.game.rcon_tell(player_num, "^7Rank %s: ^2#%d ^7of %d players" % (player.get_name(), rank, total))
+
     def tell_say_message(self, sar, msg):
         """
         display message in private or global chat
@@ -1945,29 +2155,29 @@ class LogParser(object):
             duration_output = "24 hours"
         return duration, duration_output
 
-    def handle_flag(self, line):
+    def handle_flag(self, event):
         """
         handle flag
         """
-        tmp = line.split()
-        player_num = int(tmp[0])
-        action = tmp[1]
+        player_num = event.numbers[0]
+        action = event.numbers[1]
         with self.players_lock:
             player = self.game.players[player_num]
-            if action == '1:':
+            if action == 1:
                 player.return_flag()
                 logger.debug("Player %d returned the flag", player_num)
-            elif action == '2:':
+            elif action == 2:
                 player.capture_flag()
                 logger.debug("Player %d captured the flag", player_num)
 
-    def handle_bomb(self, line):
+    def handle_bomb(self, event):
         """
         handle bomb
         """
-        tmp = line.split("is") if "Bombholder" in line else line.split("by")
-        action = tmp[0].strip()
-        player_num = int(tmp[1].rstrip('!').strip())
+        # e.g. 'Bomb was planted by 2!' or 'Bombholder is 2'
+        action, _, player_num = event.data.rpartition(' ')
+        action = action.rsplit(' ', 1)[0]
+        player_num = int(player_num.rstrip('!'))
         with self.players_lock:
             player = self.game.players[player_num]
             if action == 'Bomb was defused':
@@ -1987,18 +2197,24 @@ class LogParser(object):
             elif action == 'Bombholder':
                 player.is_bombholder()
 
-    def handle_bomb_exploded(self):
+    def handle_bomb_exploded(self, _):
         """
         handle bomb exploded
         """
         logger.debug("Bomb exploded!")
         self.handle_teams_ts_mode('Red')
 
-    def handle_teams_ts_mode(self, line):
+    def handle_survivor_winner(self, event):
+        """
+        handle end of round in Team Survivor mode
+        """
+        self.handle_teams_ts_mode(event.data)
+
+    def handle_teams_ts_mode(self, team):
         """
         handle team balance in Team Survivor mode
         """
-        logger.debug("SurvivorWinner: %s team", line)
+        logger.debug("SurvivorWinner: %s team", team)
         self.autobalancer()
         if self.ts_do_team_balance:
             self.allow_cmd_teams = True
@@ -2037,21 +2253,19 @@ class LogParser(object):
                     logger.debug("Autobalancer performed team balance")
                 self.ts_do_team_balance = False
 
-    def handle_freeze(self, line):
+    def handle_freeze(self, event):
         """
         handle freeze
         """
-        info = line.split(":", 1)[0].split()
-        player_num = int(info[0])
+        player_num = event.numbers[0]
         with self.players_lock:
             self.game.players[player_num].freeze()
 
-    def handle_thawout(self, line):
+    def handle_thawout(self, event):
         """
         handle thaw out
         """
-        info = line.split(":", 1)[0].split()
-        player_num = int(info[0])
+        player_num = event.numbers[0]
         with self.players_lock:
             self.game.players[player_num].thawout()
 
@@ -2181,7 +2395,6 @@ class Player(object):
         self.guid = guid
         self.name = "".join(name.split())
         self.player_id = 0
-        self.aliases = []
         self.registered_user = False
         self.num_played = 0
         self.last_visit = 0
@@ -2199,6 +2412,7 @@ class Player(object):
         self.db_suicide = 0
         self.head_shots = 0
         self.db_head_shots = 0
+        self.db_rounds = 0
         self.hitzone = {'body': 0, 'arms': 0, 'legs': 0}
         self.all_hits = 0
         self.he_kills = 0
@@ -2228,30 +2442,25 @@ class Player(object):
         self.welcome_msg = True
         self.country = None
         self.ban_id = 0
+        self.range_ban_id = 0
 
         self.prettyname = self.name
         # remove color characters from name
         for item in xrange(10):
             self.prettyname = self.prettyname.replace('^%d' % item, '')
 
-        # GeoIP lookup
-        info = GEOIP.lookup(ip_address)
-        if info.country:
-            self.country = "%s (%s)" % (info.country_name, info.country)
+        # GeoIP lookup, reconnecting players are found in the cache
+        self.country = COUNTRY_CACHE.get(ip_address, False)
+        if self.country is False:
+            info = GEOIP.lookup(ip_address)
+            self.country = "%s (%s)" % (info.country_name, info.country) if info.country else None
+            COUNTRY_CACHE.put(ip_address, self.country)
 
         # check ban_list
         now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time_joined))
-        values = (self.guid, now)
-        curs.execute("SELECT `id` FROM `ban_list` WHERE `guid` = ? AND `expires` > ?", values)
-        result = curs.fetchone()
-        if result:
-            self.ban_id = result[0]
-        else:
-            values = (self.address, now)
-            curs.execute("SELECT `id` FROM `ban_list` WHERE `ip_address` = ? AND `expires` > ?", values)
-            result = curs.fetchone()
-            if result:
-                self.ban_id = result[0]
+        self.ban_id = BAN_INDEX.find(self.guid, self.address, now)
+        if not self.ban_id:
+            self.range_ban_id = BAN_INDEX.find_range(self.address, now)
 
     def ban(self, duration=900, reason='tk', admin=None):
         if admin:
@@ -2267,16 +2476,22 @@ class Player(object):
                 values = (self.address, expire_date, self.guid)
                 curs.execute("UPDATE `ban_list` SET `ip_address` = ?,`expires` = ? WHERE `guid` = ?", values)
                 conn.commit()
+                # expired bans of the guid are not in the ban index
+                curs.execute("SELECT `id` FROM `ban_list` WHERE `guid` = ?", values[2:])
+                for row in curs.fetchall():
+                    BAN_INDEX.put(row[0], self.guid, self.address, expire_date)
                 return True
             else:
                 values = (self.address, self.guid)
                 curs.execute("UPDATE `ban_list` SET `ip_address` = ? WHERE `guid` = ?", values)
                 conn.commit()
+                BAN_INDEX.update_guid(self.guid, self.address)
                 return False
         else:
             values = (self.player_id, self.guid, self.prettyname, self.address, expire_date, timestamp, reason)
             curs.execute("INSERT INTO `ban_list` (`id`,`guid`,`name`,`ip_address`,`expires`,`timestamp`,`reason`) VALUES (?,?,?,?,?,?,?)", values)
             conn.commit()
+            BAN_INDEX.put(self.player_id, self.guid, self.address, expire_date)
             return True
 
     def add_ban_point(self, point_type, duration):
@@ -2336,76 +2551,58 @@ class Player(object):
             values = (self.db_kills, self.db_deaths, self.db_head_shots, self.db_tk_count, self.db_team_death, self.db_killing_streak, self.db_suicide, ratio, self.guid)
             curs.execute("UPDATE `xlrstats` SET `kills` = ?,`deaths` = ?,`headshots` = ?,`team_kills` = ?,`team_death` = ?,`max_kill_streak` = ?,`suicides` = ?,`rounds` = `rounds` + 1,`ratio` = ? WHERE `guid` = ?", values)
             conn.commit()
+            self.db_rounds += 1
+            LEADERBOARD.update(self.guid, self.prettyname, self.db_rounds, {'ratio': ratio, 'kills': self.db_kills, 'headshots': self.db_head_shots, 'max_kill_streak': self.db_killing_streak})
 
     def check_database(self):
         now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
-        # check player table
+        # get player and XLRSTATS data with one query, the rows may or may not exist independently
         values = (self.guid,)
-        curs.execute("SELECT COUNT(*) FROM `player` WHERE `guid` = ?", values)
-        if curs.fetchone()[0] == 0:
+        curs.execute("SELECT p.`id`,x.`id`,x.`last_played`,x.`num_played`,x.`kills`,x.`deaths`,x.`headshots`,x.`team_kills`,x.`team_death`,x.`max_kill_streak`,x.`suicides`,x.`admin_role`,x.`first_seen`,x.`rounds` FROM (SELECT ? AS `guid`) g LEFT JOIN `player` p ON p.`guid` = g.`guid` LEFT JOIN `xlrstats` x ON x.`guid` = g.`guid`", values)
+        result = curs.fetchone()
+        # check player table
+        if result[0] is None:
             # add new player to database
-            values = (self.guid, self.prettyname, self.address, now, self.prettyname)
-            curs.execute("INSERT INTO `player` (`guid`,`name`,`ip_address`,`time_joined`,`aliases`) VALUES (?,?,?,?,?)", values)
-            conn.commit()
-            self.aliases.append(self.prettyname)
+            values = (self.guid, self.prettyname, self.address, now)
+            curs.execute("INSERT INTO `player` (`guid`,`name`,`ip_address`,`time_joined`) VALUES (?,?,?,?)", values)
+            self.player_id = curs.lastrowid
         else:
+            self.player_id = result[0]
             # update name, IP address and last join date
             values = (self.prettyname, self.address, now, self.guid)
             curs.execute("UPDATE `player` SET `name` = ?,`ip_address` = ?,`time_joined` = ? WHERE `guid` = ?", values)
-            conn.commit()
-            # get known aliases
-            values = (self.guid,)
-            curs.execute("SELECT `aliases` FROM `player` WHERE `guid` = ?", values)
-            result = curs.fetchone()
-            # create list of aliases
-            self.aliases = result[0].split(', ')
-            if self.prettyname not in self.aliases:
-                # add new alias to list
-                if len(self.aliases) < 15:
-                    self.aliases.append(self.prettyname)
-                    alias_string = ', '.join(self.aliases)
-                    values = (alias_string, self.guid)
-                    curs.execute("UPDATE `player` SET `aliases` = ? WHERE `guid` = ?", values)
-                    conn.commit()
-        # get player-id
-        values = (self.guid,)
-        curs.execute("SELECT `id` FROM `player` WHERE `guid` = ?", values)
-        self.player_id = curs.fetchone()[0]
+        # add the name to the aliases or update the date the alias was last seen
+        values = (now, self.guid, self.prettyname)
+        curs.execute("UPDATE `alias` SET `last_seen` = ? WHERE `guid` = ? AND `alias` = ?", values)
+        values = (self.guid, self.prettyname, now, now)
+        curs.execute("INSERT OR IGNORE INTO `alias` (`guid`,`alias`,`first_seen`,`last_seen`) VALUES (?,?,?,?)", values)
         # check XLRSTATS table
-        values = (self.guid,)
-        curs.execute("SELECT COUNT(*) FROM `xlrstats` WHERE `guid` = ?", values)
-        if curs.fetchone()[0] == 0:
+        if result[1] is None:
             self.registered_user = False
         else:
             self.registered_user = True
-            # get DB DATA for XLRSTATS
-            values = (self.guid,)
-            curs.execute("SELECT `last_played`,`num_played`,`kills`,`deaths`,`headshots`,`team_kills`,`team_death`,`max_kill_streak`,`suicides`,`admin_role`,`first_seen` FROM `xlrstats` WHERE `guid` = ?", values)
-            result = curs.fetchone()
-            self.last_visit = result[0]
-            self.num_played = result[1]
-            self.db_kills = result[2]
-            self.db_deaths = result[3]
-            self.db_head_shots = result[4]
-            self.db_tk_count = result[5]
-            self.db_team_death = result[6]
-            self.db_killing_streak = result[7]
-            self.db_suicide = result[8]
-            self.admin_role = result[9]
-            self.first_seen = result[10]
+            self.last_visit = result[2]
+            self.num_played = result[3]
+            self.db_kills = result[4]
+            self.db_deaths = result[5]
+            self.db_head_shots = result[6]
+            self.db_tk_count = result[7]
+            self.db_team_death = result[8]
+            self.db_killing_streak = result[9]
+            self.db_suicide = result[10]
+            self.admin_role = result[11]
+            self.first_seen = result[12]
+            self.db_rounds = result[13]
+            LEADERBOARD.set_name(self.guid, self.prettyname)
             # update name, last_played and increase num_played counter
             values = (self.prettyname, now, self.guid)
             curs.execute("UPDATE `xlrstats` SET `name` = ?,`last_played` = ?,`num_played` = `num_played` + 1 WHERE `guid` = ?", values)
-            conn.commit()
+        # write all changes in one transaction
+        conn.commit()
 
     def define_offline_player(self, player_id):
         self.player_id = player_id
         values = (self.guid,)
-        # get known aliases
-        curs.execute("SELECT `aliases` FROM `player` WHERE `guid` = ?", values)
-        result = curs.fetchone()
-        # create list of aliases
-        self.aliases = result[0].split(', ')
         curs.execute("SELECT COUNT(*) FROM `xlrstats` WHERE `guid` = ?", values)
         if curs.fetchone()[0] == 0:
             self.admin_role = 0
@@ -2423,6 +2620,7 @@ class Player(object):
             values = (self.guid, self.prettyname, self.address, now, now, role)
             curs.execute("INSERT INTO `xlrstats` (`guid`,`name`,`ip_address`,`first_seen`,`last_played`,`num_played`,`admin_role`) VALUES (?,?,?,?,?,1,?)", values)
             conn.commit()
+            LEADERBOARD.update(self.guid, self.prettyname, 0, {'kills': 0, 'headshots': 0, 'max_kill_streak': 0})
             self.registered_user = True
             self.admin_role = role
             self.welcome_msg = False
@@ -2439,6 +2637,9 @@ class Player(object):
     def get_ban_id(self):
         return self.ban_id
 
+    def get_range_ban_id(self):
+        return self.range_ban_id
+
     def set_name(self, name):
         self.name = "".join(name.split())
 
@@ -2446,9 +2647,13 @@ class Player(object):
         return self.name
 
     def get_aliases(self):
-        if len(self.aliases) == 15:
-            self.aliases.append("and more...")
-        return str(", ^3".join(self.aliases))
+        # the first 15 aliases in the order they were seen
+        values = (self.guid,)
+        curs.execute("SELECT `alias` FROM `alias` WHERE `guid` = ? ORDER BY `id` LIMIT 16", values)
+        aliases = [row[0] for row in curs.fetchall()]
+        if len(aliases) > 15:
+            aliases[15:] = ["and more..."]
+        return str(", ^3".join(aliases))
 
     def set_guid(self, guid):
         self.guid = guid
@@ -2759,7 +2964,11 @@ class Game(object):
         self.urt42_modversion = urt42_modversion
         game_cfg = ConfigParser.ConfigParser()
         game_cfg.read(config_file)
-        self.rcon_handle = Rcon(game_cfg.get('server', 'server_ip'), game_cfg.get('server', 'server_port'), game_cfg.get('server', 'rcon_password'))
+        # maximum number of RCON packets per second
+        rcon_rate = game_cfg.getfloat('server', 'rcon_rate') if game_cfg.has_option('server', 'rcon_rate') else 1
+        # merge say and tell messages into one RCON command
+        rcon_coalesce = game_cfg.getboolean('server', 'rcon_coalesce') if game_cfg.has_option('server', 'rcon_coalesce') else False
+        self.rcon_handle = Rcon(game_cfg.get('server', 'server_ip'), game_cfg.get('server', 'server_port'), game_cfg.get('server', 'rcon_password'), rcon_rate, rcon_coalesce)
         logger.info("Opening RCON socket   : OK")
         if game_cfg.getboolean('rules', 'show_rules'):
             # create instance of Rules to display the rules and rotation messages
@@ -2975,30 +3184,70 @@ class Game(object):
         self.rcon_say("^7Autobalance complete!")
 
 
-### Main ###
-# get full path of spunky.py
-HOME = os.path.dirname(os.path.realpath(__file__))
-home_path = HOME
-
-if len(sys.argv) == 2: 
-    if os.path.exists(home_path):
-        home_path = sys.argv[1]
-
-# load the GEO database and store it globally in interpreter memory
-GEOIP = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'))
-
-# connect to database
-conn = sqlite3.connect(os.path.join(home_path, 'data.sqlite'))
-curs = conn.cursor()
+### Read Logs ###
+def read_logs(parsers):
+    """
+    parse the logfiles of one or several game servers
 
-# create tables if not exists
-curs.execute('CREATE TABLE IF NOT EXISTS xlrstats (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT NOT NULL, ip_address TEXT NOT NULL, first_seen DATETIME, last_played DATETIME, num_played INTEGER DEFAULT 1, kills INTEGER DEFAULT 0, deaths INTEGER DEFAULT 0, headshots INTEGER DEFAULT 0, team_kills INTEGER DEFAULT 0, team_death INTEGER DEFAULT 0, max_kill_streak INTEGER DEFAULT 0, suicides INTEGER DEFAULT 0, ratio REAL DEFAULT 0, rounds INTEGER DEFAULT 0, admin_role INTEGER DEFAULT 1)')
-curs.execute('CREATE TABLE IF NOT EXISTS player (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT NOT NULL, ip_address TEXT NOT NULL, time_joined DATETIME, aliases TEXT)')
-curs.execute('CREATE TABLE IF NOT EXISTS ban_list (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT, ip_address TEXT, expires DATETIME DEFAULT 259200, timestamp DATETIME, reason TEXT)')
-curs.execute('CREATE TABLE IF NOT EXISTS ban_points (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, point_type TEXT, expires DATETIME)')
+    @param parsers: The instances of LogParser
+    @type  parsers: List
+    """
+    for parser in parsers:
+        parser.start()
+    log_tails = [parser.log_tail for parser in parsers]
+    while 1:
+        # scheduled tasks are checked once per batch of lines
+        schedule.run_pending()
+        idle = True
+        for parser in parsers:
+            # one batch per server and round, a busy server does not hold up the others
+            if parser.parse_log():
+                idle = False
+        if idle:
+            # sleep until a game log file has been modified, wake up in time for the scheduled tasks
+            wait_any(log_tails, 1)
 
-# create instance of LogParser
-LogParser(os.path.join(home_path, 'conf', 'settings.conf'))
 
-# close database connection
-conn.close()
+### Main ###
+if __name__ == '__main__':
+    # get full path of spunky.py
+    HOME = os.path.dirname(os.path.realpath(__file__))
+    home_path = HOME
+
+    if len(sys.argv) == 2:
+        if os.path.exists(home_path):
+            home_path = sys.argv[1]
+
+    # map the GEO database read-only into memory, the pages are shared with other bot processes
+    # countries are looked up in the compiled index, which is cached in the file GeoIP.dat.idx and mapped as well
+    GEOIP = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'), use_mmap=True, use_index=True)
+
+    # connect to database, the changes are committed in the background by the writer thread
+    conn = WriteBehind(os.path.join(home_path, 'data.sqlite'))
+    curs = conn.cursor()
+
+    # create tables if not exists and update the schema of existing databases
+    migration.migrate(conn.connection)
+
+    # load the active bans into memory, players are checked against the ban index on connect
+    BAN_INDEX.load(curs, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time())))
+
+    # rank the registered players, the leaderboards are updated with the stats of every round
+    LEADERBOARD.load(curs)
+
+    # settings of the game server and of further game servers administered by this bot
+    settings_file = os.path.join(home_path, 'conf', 'settings.conf')
+    settings = ConfigParser.ConfigParser()
+    settings.read(settings_file)
+    additional_servers = settings.get('bot', 'additional_servers') if settings.has_option('bot', 'additional_servers') else ''
+    config_files = [settings_file] + [os.path.join(home_path, name.strip()) for name in additional_servers.split(',') if name.strip()]
+
+    # the initscript stops the bot with SIGTERM, exit through the finally clause to commit the queued changes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        # create instances of LogParser and start parsing the games logfiles
+        read_logs([LogParser(config_file) for config_file in config_files])
+    finally:
+        # commit the queued changes and close database connection
+        conn.close()
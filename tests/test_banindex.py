@@ -0,0 +1,161 @@
+"""
+Tests of lib/banindex.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import random
+import sqlite3
+import unittest
+
+from lib.banindex import BanIndex, RangeIndex, is_cidr, parse_cidr
+
+
+NOW = '2016-06-01 12:00:00'
+LATER = '2016-06-02 12:00:00'
+
+
+class CidrTest(unittest.TestCase):
+    """
+    arguments of the !rangeban command
+    """
+
+    def test_addresses_and_networks(self):
+        for text in ('1.2.3.4', '1.2.3.0/24', '10.0.0.0/8', '255.255.255.255/32'):
+            self.assertTrue(is_cidr(text), text)
+
+    def test_player_names(self):
+        # names starting with a digit are looked up as players
+        for text in ('1337', '2pac', '1.2.3', '1.2.3.4.5', '1.2.3.4/', '1.2.3.4/240', '1.2.3.4x', 'a1.2.3.4', ''):
+            self.assertFalse(is_cidr(text), text)
+
+    def test_parse_cidr(self):
+        self.assertEqual(parse_cidr('1.2.3.4'), (0x01020304, 0x01020304))
+        self.assertEqual(parse_cidr('1.2.3.4/24'), (0x01020300, 0x010203ff))
+        self.assertEqual(parse_cidr('1.2.200.4/16'), (0x01020000, 0x0102ffff))
+        self.assertRaises(ValueError, parse_cidr, '1.2.3.4/33')
+        self.assertRaises(ValueError, parse_cidr, '999.1.1.1')
+
+
+class RangeIndexTest(unittest.TestCase):
+    """
+    lookups of overlapping ranges
+    """
+
+    def setUp(self):
+        self.index = RangeIndex()
+
+    def test_nested_ranges(self):
+        self.index.put(1, 100, 199, LATER)
+        self.index.put(2, 120, 129, LATER)
+        self.index.put(3, 150, 150, LATER)
+        self.assertEqual(self.index.find(99, NOW), 0)
+        self.assertEqual(self.index.find(100, NOW), 1)
+        self.assertEqual(self.index.find(125, NOW), 1)
+        self.assertEqual(self.index.find(150, NOW), 1)
+        self.assertEqual(self.index.find(199, NOW), 1)
+        self.assertEqual(self.index.find(200, NOW), 0)
+        self.index.remove(1)
+        self.assertEqual(self.index.find(110, NOW), 0)
+        self.assertEqual(self.index.find(125, NOW), 2)
+        self.assertEqual(self.index.find(150, NOW), 3)
+
+    def test_range_reaching_over_later_ranges(self):
+        # the address is beyond the ranges starting right before it, but within the first range
+        self.index.put(1, 0, 1000, LATER)
+        self.index.put(2, 10, 20, LATER)
+        self.index.put(3, 500, 600, LATER)
+        self.assertEqual(self.index.find(700, NOW), 1)
+        self.assertEqual(self.index.find(1001, NOW), 0)
+
+    def test_expired_range_hiding_another(self):
+        self.index.put(1, 0, 1000, NOW)
+        self.index.put(2, 10, 20, LATER)
+        self.index.put(3, 30, 40, LATER)
+        self.assertEqual(self.index.find(15, NOW), 2)
+        self.assertEqual(self.index.find(35, NOW), 3)
+        self.assertEqual(self.index.find(25, NOW), 0)
+        self.assertEqual(len(self.index), 2)
+
+    def test_replaced_range(self):
+        self.index.put(1, 0, 100, LATER)
+        self.assertEqual(self.index.find(50, NOW), 1)
+        self.index.put(1, 200, 300, LATER)
+        self.assertEqual(self.index.find(50, NOW), 0)
+        self.assertEqual(self.index.find(250, NOW), 1)
+
+    def test_same_as_linear_search(self):
+        rand = random.Random(42)
+        ranges = {}
+        for range_id in xrange(1, 200):
+            first = rand.randint(0, 10000)
+            ranges[range_id] = (first, first + rand.choice((0, 10, 100, 1000, 5000)), rand.choice((NOW, LATER)))
+            self.index.put(range_id, *ranges[range_id])
+        for ipnum in xrange(0, 16000, 7):
+            found = self.index.find(ipnum, NOW)
+            if found:
+                first, last, expires = ranges[found]
+                self.assertTrue(first <= ipnum <= last and expires > NOW)
+            else:
+                self.assertFalse([range_id for range_id, item in ranges.iteritems() if item[0] <= ipnum <= item[1] and item[2] > NOW])
+
+
+class BanIndexTest(unittest.TestCase):
+    """
+    bans loaded from an in-memory ban_list table
+    """
+
+    def setUp(self):
+        connection = sqlite3.connect(':memory:')
+        curs = connection.cursor()
+        curs.execute('CREATE TABLE ban_list (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT, ip_address TEXT, expires DATETIME DEFAULT 259200, timestamp DATETIME, reason TEXT)')
+        curs.execute('CREATE TABLE ban_range (id INTEGER PRIMARY KEY NOT NULL, first_ip INTEGER NOT NULL, last_ip INTEGER NOT NULL, cidr TEXT NOT NULL, name TEXT, expires DATETIME, timestamp DATETIME, reason TEXT)')
+        curs.executemany('INSERT INTO ban_list (id, guid, ip_address, expires) VALUES (?,?,?,?)',
+                         [(1, 'AAAA', '1.1.1.1', '2016-06-01 18:00:00'),
+                          (2, 'BBBB', '2.2.2.2', '2016-05-01 12:00:00'),
+                          (3, 'CCCC', '1.1.1.1', '2036-01-01 00:00:00'),
+                          (4, 'AAAA', '4.4.4.4', '2036-01-01 00:00:00')])
+        curs.execute("INSERT INTO ban_range (id, first_ip, last_ip, cidr, expires) VALUES (1, 16909056, 16909311, '1.2.3.0/24', '2036-01-01 00:00:00')")
+        self.index = BanIndex()
+        self.index.load(curs, NOW)
+        connection.close()
+
+    def test_load_active_bans(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.find('BBBB', '2.2.2.2', NOW), 0)
+        self.assertEqual(self.index.find_range('1.2.3.4', NOW), 1)
+
+    def test_find_by_guid_or_ip_address(self):
+        self.assertEqual(self.index.find('AAAA', '9.9.9.9', NOW), 1)
+        # the bans of the guid come first
+        self.assertEqual(self.index.find('CCCC', '4.4.4.4', NOW), 3)
+        self.assertEqual(self.index.find('DDDD', '1.1.1.1', NOW), 1)
+        self.assertEqual(self.index.find('DDDD', '9.9.9.9', NOW), 0)
+
+    def test_expired_bans(self):
+        self.assertEqual(self.index.find('AAAA', '9.9.9.9', LATER), 4)
+        self.assertEqual(self.index.find('DDDD', '1.1.1.1', LATER), 3)
+        self.index.remove_expired(LATER)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.find('DDDD', '1.1.1.1', NOW), 3)
+
+    def test_update_guid(self):
+        self.index.update_guid('AAAA', '5.5.5.5', LATER)
+        self.assertEqual(self.index.find('DDDD', '5.5.5.5', NOW), 1)
+        self.assertEqual(self.index.find('DDDD', '4.4.4.4', NOW), 0)
+        self.assertEqual(self.index.find('DDDD', '1.1.1.1', NOW), 3)
+        self.assertEqual(self.index.find('AAAA', '9.9.9.9', '2016-06-01 18:00:00'), 1)
+
+    def test_remove(self):
+        self.index.remove(1)
+        self.index.remove(1)
+        self.assertEqual(self.index.find('AAAA', '9.9.9.9', NOW), 4)
+        self.index.remove_matching('EEEE', '1.1.1.1')
+        self.assertEqual(self.index.find('CCCC', '1.1.1.1', NOW), 0)
+        self.assertEqual(len(self.index), 1)
+        self.assertFalse('1.1.1.1' in self.index.by_ip)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests of lib/leaderboard.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import random
+import sqlite3
+import unittest
+
+from lib.leaderboard import Leaderboard, Leaderboards
+
+
+class LeaderboardTest(unittest.TestCase):
+    """
+    ranks of one statistic after updates
+    """
+
+    def setUp(self):
+        self.board = Leaderboard()
+        self.board.load([('AAAA', 10), ('BBBB', 30), ('CCCC', 20)])
+
+    def ranks(self):
+        return [self.board.rank(guid) for guid in ('AAAA', 'BBBB', 'CCCC', 'DDDD')]
+
+    def test_load(self):
+        self.assertEqual(self.board.top(2), [('BBBB', 30), ('CCCC', 20)])
+        self.assertEqual(self.ranks(), [3, 1, 2, None])
+
+    def test_update_moves_player(self):
+        self.board.update('AAAA', 40)
+        self.assertEqual(self.ranks(), [1, 2, 3, None])
+        self.board.update('AAAA', 25)
+        self.assertEqual(self.ranks(), [2, 1, 3, None])
+        self.board.update('BBBB', 0)
+        self.assertEqual(self.ranks(), [1, 3, 2, None])
+        self.board.update('DDDD', 20)
+        self.assertEqual(self.ranks(), [1, 4, 2, 3])
+        self.assertEqual(len(self.board), 4)
+
+    def test_equal_values_ordered_by_guid(self):
+        self.board.update('DDDD', 20)
+        self.board.update('AAAA', 20)
+        self.assertEqual(self.board.top(4), [('BBBB', 30), ('AAAA', 20), ('CCCC', 20), ('DDDD', 20)])
+        self.board.update('AAAA', 20)
+        self.assertEqual(self.ranks(), [2, 1, 3, 4])
+
+    def test_remove(self):
+        self.board.remove('CCCC')
+        self.board.remove('CCCC')
+        self.assertEqual(self.ranks(), [2, 1, None, None])
+        self.assertFalse('CCCC' in self.board)
+
+    def test_same_as_sorting(self):
+        rand = random.Random(42)
+        values = {}
+        for _ in xrange(2000):
+            guid = 'GUID%02d' % rand.randint(0, 50)
+            if rand.random() < .1:
+                self.board.remove(guid)
+                values.pop(guid, None)
+            else:
+                values[guid] = rand.randint(0, 100)
+                self.board.update(guid, values[guid])
+        values.update({'AAAA': 10, 'BBBB': 30, 'CCCC': 20})
+        ranking = sorted(values, key=lambda guid: (-values[guid], guid))
+        self.assertEqual(self.board.top(len(ranking) + 1), [(ranked, values[ranked]) for ranked in ranking])
+        for rank, guid in enumerate(ranking, 1):
+            self.assertEqual(self.board.rank(guid), rank)
+
+
+class LeaderboardsTest(unittest.TestCase):
+    """
+    leaderboards loaded from an in-memory xlrstats table
+    """
+
+    def setUp(self):
+        connection = sqlite3.connect(':memory:')
+        curs = connection.cursor()
+        curs.execute('CREATE TABLE xlrstats (id INTEGER PRIMARY KEY NOT NULL, guid TEXT NOT NULL, name TEXT NOT NULL, rounds INTEGER, ratio REAL, kills INTEGER, headshots INTEGER, max_kill_streak INTEGER)')
+        curs.executemany('INSERT INTO xlrstats (guid, name, rounds, ratio, kills, headshots, max_kill_streak) VALUES (?,?,?,?,?,?,?)',
+                         [('AAAA', 'Alpha', 100, 1.5, 300, 20, 8),
+                          ('BBBB', 'Bravo', 30, 2.5, 100, 40, 5),
+                          ('CCCC', 'Charlie', 10, 9.0, 90, 5, 12)])
+        self.boards = Leaderboards(min_rounds=25)
+        self.boards.load(curs)
+        connection.close()
+
+    def test_load(self):
+        # too few rounds to be ranked by ratio
+        self.assertEqual(self.boards.top('ratio', 3), [('Bravo', 2.5), ('Alpha', 1.5)])
+        self.assertEqual(self.boards.rank('ratio', 'CCCC'), (None, 2))
+        self.assertEqual(self.boards.top('kills', 3), [('Alpha', 300), ('Bravo', 100), ('Charlie', 90)])
+        self.assertEqual(self.boards.rank('max_kill_streak', 'CCCC'), (1, 3))
+
+    def test_update_after_round(self):
+        self.boards.update('CCCC', 'Charlie', 20, {'ratio': 8.0, 'kills': 400, 'headshots': 6, 'max_kill_streak': 12})
+        self.assertEqual(self.boards.rank('ratio', 'CCCC'), (None, 2))
+        self.assertEqual(self.boards.rank('kills', 'CCCC'), (1, 3))
+        self.boards.update('CCCC', 'Charlie', 26, {'ratio': 2.0, 'kills': 410, 'headshots': 6, 'max_kill_streak': 12})
+        self.assertEqual(self.boards.top('ratio', 3), [('Bravo', 2.5), ('Charlie', 2.0), ('Alpha', 1.5)])
+
+    def test_new_player(self):
+        self.boards.update('DDDD', 'Delta', 0, {'kills': 0, 'headshots': 0, 'max_kill_streak': 0})
+        self.assertEqual(self.boards.rank('kills', 'DDDD'), (4, 4))
+        self.assertEqual(self.boards.rank('ratio', 'DDDD'), (None, 2))
+
+    def test_set_name(self):
+        self.boards.set_name('AAAA', 'Alpha2')
+        self.boards.set_name('EEEE', 'Echo')
+        self.assertEqual(self.boards.top('kills', 1), [('Alpha2', 300)])
+        self.assertFalse('EEEE' in self.boards.names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests of the LogEvent tokenizer of spunky.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import unittest
+
+from spunky import LogEvent
+
+
+class LogEventTest(unittest.TestCase):
+    """
+    numeric fields and payload of the events of games.log
+    """
+
+    def tokens(self, data):
+        event = LogEvent('3:12', 'Test', data)
+        return event.numbers, event.payload
+
+    def test_numbers_with_payload(self):
+        self.assertEqual(self.tokens('2 4 1 8: Player2 hit Player4 in the Helmet'), ([2, 4, 1, 8], 'Player2 hit Player4 in the Helmet'))
+        self.assertEqual(self.tokens('1022 4 19: <non-client> killed Player4 by MOD_FALLING'), ([1022, 4, 19], '<non-client> killed Player4 by MOD_FALLING'))
+        self.assertEqual(self.tokens('0: 15000'), ([0], '15000'))
+
+    def test_numbers_without_colon(self):
+        self.assertEqual(self.tokens('2'), ([2], ''))
+        self.assertEqual(self.tokens('2 ut_weapon_lr'), ([2], 'ut_weapon_lr'))
+        self.assertEqual(self.tokens('2 \\ip\\1.2.3.4:27960\\name\\Player2'), ([2], '\\ip\\1.2.3.4:27960\\name\\Player2'))
+
+    def test_numbers_beyond_lookup(self):
+        # numbers which are not looked up are converted with int()
+        self.assertEqual(self.tokens('1024 3: x'), ([1024, 3], 'x'))
+        self.assertEqual(self.tokens('007: x'), ([7], 'x'))
+
+    def test_partial_numbers(self):
+        self.assertEqual(self.tokens('2 Player2: nice shot'), ([2], 'Player2: nice shot'))
+        self.assertEqual(self.tokens('2  4: x'), ([2], ' 4: x'))
+        self.assertEqual(self.tokens('2 3:x'), ([2], '3:x'))
+
+    def test_no_numbers(self):
+        self.assertEqual(self.tokens('Player2: x'), ([], 'Player2: x'))
+        self.assertEqual(self.tokens('-1 2: x'), ([], '-1 2: x'))
+        self.assertEqual(self.tokens('12abc'), ([], '12abc'))
+        self.assertEqual(self.tokens(''), ([], ''))
+
+    def test_tokenized_once(self):
+        event = LogEvent('3:12', 'Hit', '2 4 1 8: x')
+        self.assertTrue(event.tokens is None)
+        numbers = event.numbers
+        self.assertTrue(event.numbers is numbers)
+
+
+if __name__ == '__main__':
+    unittest.main()
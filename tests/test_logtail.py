@@ -0,0 +1,173 @@
+"""
+Tests of lib/logtail.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+from lib.logtail import LogTail, wait_any
+
+
+# the truncated and rotated log files are logged
+logging.getLogger('spunkybot').addHandler(logging.NullHandler())
+
+
+class LogTailTest(unittest.TestCase):
+    """
+    game log written to a temporary directory
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.games_log = os.path.join(self.directory, 'games.log')
+        self.write('0:00 InitGame: \\sv_hostname\\Test\n')
+        self.tails = []
+
+    def tearDown(self):
+        for tail in self.tails:
+            os.close(tail.fd)
+            if tail.inotify:
+                os.close(tail.inotify.fd)
+        shutil.rmtree(self.directory)
+
+    def write(self, data, mode='a'):
+        with open(self.games_log, mode) as fp:
+            fp.write(data)
+
+    def open_tail(self, **kwargs):
+        tail = LogTail(self.games_log, **kwargs)
+        self.tails.append(tail)
+        return tail
+
+    def test_appended_lines(self):
+        tail = self.open_tail()
+        self.assertEqual(tail.read_lines(), ['0:00 InitGame: \\sv_hostname\\Test'])
+        self.assertEqual(tail.read_lines(), [])
+        self.write('0:01 ClientConnect: 0\n0:01 Client')
+        # the incomplete line is kept until the rest has been written
+        self.assertEqual(tail.read_lines(), ['0:01 ClientConnect: 0'])
+        self.write('Begin: 0\n')
+        self.assertEqual(tail.read_lines(), ['0:01 ClientBegin: 0'])
+
+    def test_seek_end(self):
+        tail = self.open_tail()
+        tail.seek_end()
+        self.assertEqual(tail.read_lines(), [])
+        self.write('0:02 ShutdownGame:\n')
+        self.assertEqual(tail.read_lines(), ['0:02 ShutdownGame:'])
+
+    def test_truncated(self):
+        tail = self.open_tail()
+        tail.seek_end()
+        # the new content is shorter than the old one
+        self.write('0:00 InitGame: \\sv_hostname\\New\n', 'w')
+        self.assertEqual(tail.read_lines(), ['0:00 InitGame: \\sv_hostname\\New'])
+
+    def test_rotated(self):
+        tail = self.open_tail()
+        tail.seek_end()
+        # the game server writes the rest of the old log file after the rename
+        os.rename(self.games_log, self.games_log + '.1')
+        with open(self.games_log + '.1', 'a') as fp:
+            fp.write('0:05 ShutdownGame:\n')
+        self.write('0:00 InitGame: \\sv_hostname\\Rotated\n')
+        self.assertEqual(tail.read_lines(), ['0:05 ShutdownGame:', '0:00 InitGame: \\sv_hostname\\Rotated'])
+        self.write('0:01 ClientConnect: 0\n')
+        self.assertEqual(tail.read_lines(), ['0:01 ClientConnect: 0'])
+
+    def test_moved_away(self):
+        tail = self.open_tail()
+        tail.seek_end()
+        os.rename(self.games_log, self.games_log + '.1')
+        self.assertEqual(tail.read_lines(), [])
+        self.assertEqual(tail.read_lines(), [])
+        # the new log file is opened when it has been created
+        self.write('0:00 InitGame: \\sv_hostname\\Created\n')
+        self.assertEqual(tail.read_lines(), ['0:00 InitGame: \\sv_hostname\\Created'])
+
+    def test_bounded_batches(self):
+        tail = self.open_tail(max_batch=100)
+        tail.seek_end()
+        lines = ['0:%02d Item: 0 ut_weapon_lr' % num for num in xrange(40)]
+        self.write(''.join('%s\n' % line for line in lines))
+        self.assertEqual(tail.get_backlog(), 40 * 26)
+        read = []
+        while tail.get_backlog():
+            backlog = tail.get_backlog()
+            batch = tail.read_lines()
+            self.assertEqual(tail.get_backlog(), backlog - 100 if backlog > 100 else 0)
+            self.assertTrue(sum(len(line) + 1 for line in batch) <= 100 + 26)
+            read.extend(batch)
+        self.assertEqual(read, lines)
+
+    def test_rotated_after_backlog(self):
+        tail = self.open_tail(max_batch=100)
+        tail.seek_end()
+        lines = ['0:%02d Item: 0 ut_weapon_lr' % num for num in xrange(10)]
+        self.write(''.join('%s\n' % line for line in lines))
+        os.rename(self.games_log, self.games_log + '.1')
+        self.write('0:00 InitGame: \\sv_hostname\\Rotated\n')
+        # the new log file is opened when all lines of the old one have been read
+        read = tail.read_lines()
+        while tail.get_backlog():
+            self.assertEqual(os.fstat(tail.fd).st_ino, os.stat(self.games_log + '.1').st_ino)
+            read.extend(tail.read_lines())
+        self.assertEqual(read, lines + ['0:00 InitGame: \\sv_hostname\\Rotated'])
+
+
+class WaitAnyTest(unittest.TestCase):
+    """
+    game logs of two servers in their own temporary directories
+    """
+
+    def setUp(self):
+        self.directories = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        self.games_logs = [os.path.join(directory, 'games.log') for directory in self.directories]
+        for games_log in self.games_logs:
+            open(games_log, 'w').close()
+        self.tails = [LogTail(games_log) for games_log in self.games_logs]
+        if not all(tail.inotify for tail in self.tails):
+            # tearDown is not called for a skipped test
+            self.tearDown()
+            self.skipTest('inotify is not available')
+
+    def tearDown(self):
+        for tail in self.tails:
+            os.close(tail.fd)
+            if tail.inotify:
+                os.close(tail.inotify.fd)
+        for directory in self.directories:
+            shutil.rmtree(directory)
+
+    def elapsed(self, timeout):
+        start = time.time()
+        wait_any(self.tails, timeout)
+        return time.time() - start
+
+    def test_any_log_modified(self):
+        for games_log in self.games_logs:
+            with open(games_log, 'a') as fp:
+                fp.write('0:00 InitGame: \\sv_hostname\\Test\n')
+            self.assertTrue(self.elapsed(5) < 1)
+            # the event has been consumed
+            self.assertTrue(self.elapsed(.2) >= .15)
+
+    def test_other_files_ignored(self):
+        with open(os.path.join(self.directories[1], 'qconsole.log'), 'w') as fp:
+            fp.write('Hunk_Clear: reset the hunk ok\n')
+        self.assertTrue(self.elapsed(.2) >= .15)
+
+    def test_log_rotated(self):
+        os.rename(self.games_logs[1], self.games_logs[1] + '.1')
+        self.assertTrue(self.elapsed(5) < 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests of lib/lrucache.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import random
+import unittest
+
+from lib.lrucache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    eviction of the least recently used entries
+    """
+
+    def order(self, cache):
+        """
+        keys of the linked list from the least to the most recently used entry
+        """
+        keys = []
+        link = cache.root[1]
+        while link is not cache.root:
+            self.assertTrue(link[1][0] is link)
+            keys.append(link[2])
+            link = link[1]
+        return keys
+
+    def test_least_recently_put_evicted(self):
+        cache = LRUCache(3)
+        for key in 'abcd':
+            cache.put(key, key.upper())
+        self.assertEqual(len(cache), 3)
+        self.assertFalse('a' in cache)
+        self.assertEqual(self.order(cache), ['b', 'c', 'd'])
+
+    def test_get_marks_used(self):
+        cache = LRUCache(3)
+        for key in 'abc':
+            cache.put(key, key.upper())
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('d', 'D')
+        self.assertEqual(self.order(cache), ['c', 'a', 'd'])
+        self.assertEqual(cache.get('b', 'missing'), 'missing')
+        self.assertEqual(cache.get_stats(), (1, 1, 3))
+
+    def test_put_replaces_value(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 3)
+        cache.put('c', 4)
+        self.assertEqual(self.order(cache), ['a', 'c'])
+        self.assertEqual(cache.get('a'), 3)
+
+    def test_single_entry(self):
+        cache = LRUCache(1)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(self.order(cache), ['b'])
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.get('a'), None)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.clear()
+        self.assertEqual((len(cache), self.order(cache), cache.get_stats()), (0, [], (0, 0, 0)))
+        cache.put('b', 2)
+        self.assertEqual(self.order(cache), ['b'])
+
+    def test_same_as_list_model(self):
+        rand = random.Random(42)
+        cache = LRUCache(16)
+        # keys from the least to the most recently used entry
+        model = []
+        values = {}
+        for num in xrange(5000):
+            key = rand.randint(0, 40)
+            if rand.random() < .5:
+                value = values.get(key) if key in model else None
+                self.assertEqual(cache.get(key), value)
+                if key in model:
+                    model.remove(key)
+                    model.append(key)
+            else:
+                cache.put(key, num)
+                values[key] = num
+                if key in model:
+                    model.remove(key)
+                elif len(model) == 16:
+                    del model[0]
+                model.append(key)
+            self.assertEqual(self.order(cache), model)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests of the schema migrations of lib/migration.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import sqlite3
+import unittest
+
+import lib.migration as migration
+
+
+class MigrationTest(unittest.TestCase):
+    """
+    migration of an in-memory database with the tables of Spunky Bot 1.4
+    """
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        for statement in migration.MIGRATIONS[0]:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def test_migrate_to_latest_version(self):
+        self.assertEqual(migration.migrate(self.connection), len(migration.MIGRATIONS))
+        self.assertEqual(migration.migrate(self.connection), len(migration.MIGRATIONS))
+
+    def test_duplicate_players_merged(self):
+        self.connection.executemany('INSERT INTO player (guid, name, ip_address, time_joined, aliases) VALUES (?,?,?,?,?)',
+                                    [('AAAA', 'Alpha', '1.1.1.1', '2015-01-01 10:00:00', 'Alpha, Bravo'),
+                                     ('BBBB', 'Other', '3.3.3.3', '2015-01-01 10:00:00', 'Other'),
+                                     ('AAAA', 'Delta', '2.2.2.2', '2016-02-02 20:00:00', 'Charlie, Delta')])
+        self.connection.commit()
+        migration.migrate(self.connection)
+        self.assertEqual(self.query("SELECT id, name, ip_address, time_joined FROM player WHERE guid = 'AAAA'"),
+                         [(1, 'Delta', '2.2.2.2', '2016-02-02 20:00:00')])
+        aliases = self.query("SELECT alias, last_seen FROM alias WHERE guid = 'AAAA' ORDER BY id")
+        self.assertEqual(aliases, [('Alpha', None), ('Bravo', None), ('Charlie', None), ('Delta', '2016-02-02 20:00:00')])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM player"), [(2,)])
+
+    def test_duplicate_stats_merged(self):
+        columns = 'guid, name, ip_address, first_seen, last_played, num_played, kills, deaths, headshots, team_kills, team_death, max_kill_streak, suicides, ratio, rounds, admin_role'
+        self.connection.executemany('INSERT INTO xlrstats (%s) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)' % columns,
+                                    [('AAAA', 'Alpha', '1.1.1.1', '2015-01-01 10:00:00', '2015-03-01 10:00:00', 10, 30, 10, 5, 1, 2, 7, 1, 3.0, 40, 20),
+                                     ('AAAA', 'Delta', '2.2.2.2', '2016-02-02 20:00:00', '2016-02-03 20:00:00', 2, 10, 10, 1, 0, 0, 4, 2, 1.0, 5, 1)])
+        self.connection.commit()
+        migration.migrate(self.connection)
+        self.assertEqual(self.query('SELECT %s FROM xlrstats' % columns),
+                         [('AAAA', 'Delta', '2.2.2.2', '2015-01-01 10:00:00', '2016-02-03 20:00:00', 12, 40, 20, 6, 1, 2, 7, 3, 2.0, 45, 20)])
+
+    def test_alias_search_created_later(self):
+        self.connection.execute("INSERT INTO player (guid, name, ip_address, aliases) VALUES ('AAAA', 'Charlie', '1.1.1.1', 'Alpha, Charlie')")
+        self.connection.commit()
+        migration.migrate(self.connection)
+        if not migration.has_alias_search(self.connection):
+            self.skipTest('sqlite library without FTS5 trigram tokenizer')
+        # the state of a database migrated by a sqlite library without FTS5 trigram tokenizer
+        for statement in ('DROP TRIGGER alias_search_insert', 'DROP TRIGGER alias_search_delete', 'DROP TRIGGER alias_search_update', 'DROP TABLE alias_search'):
+            self.connection.execute(statement)
+        self.connection.commit()
+        self.assertFalse(migration.has_alias_search(self.connection))
+        self.assertEqual(migration.migrate(self.connection), len(migration.MIGRATIONS))
+        self.assertTrue(migration.has_alias_search(self.connection))
+        self.assertEqual(self.query("SELECT alias FROM alias_search WHERE alias LIKE '%arli%'"), [('Charlie',)])
+        self.connection.execute("INSERT INTO alias (guid, alias) VALUES ('AAAA', 'Marlin')")
+        self.assertEqual(self.query("SELECT alias FROM alias_search WHERE alias LIKE '%arli%' ORDER BY alias"), [('Charlie',), ('Marlin',)])
+
+    def test_unique_guid(self):
+        migration.migrate(self.connection)
+        self.connection.execute("INSERT INTO player (guid, name, ip_address) VALUES ('AAAA', 'Alpha', '1.1.1.1')")
+        self.assertRaises(sqlite3.IntegrityError, self.connection.execute, "INSERT INTO player (guid, name, ip_address) VALUES ('AAAA', 'Bravo', '1.1.1.1')")
+
+
+if __name__ == '__main__':
+    unittest.main()
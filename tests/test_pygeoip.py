@@ -0,0 +1,86 @@
+"""
+Tests of the compiled country index of lib/pygeoip.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import lib.pygeoip as pygeoip
+
+
+GEOIP_DAT = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'lib', 'GeoIP.dat')
+
+
+class CountryIndexTest(unittest.TestCase):
+    """
+    country index cached in a temporary directory
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.directory, 'GeoIP.dat.idx')
+        self.tree = pygeoip.Database(GEOIP_DAT, use_mmap=True)
+
+    def tearDown(self):
+        self.tree.close()
+        shutil.rmtree(self.directory)
+
+    def open_indexed(self):
+        return pygeoip.Database(GEOIP_DAT, use_mmap=True, use_index=True, index_filename=self.index_file)
+
+    def test_same_countries_as_tree(self):
+        indexed = self.open_indexed()
+        self.assertTrue(isinstance(indexed.index, pygeoip.CountryIndex))
+        rand = random.Random(42)
+        addresses = ['0.0.0.0', '255.255.255.255', '127.0.0.1', '8.8.8.8']
+        addresses += ['%d.%d.%d.%d' % tuple(rand.randint(0, 255) for _ in xrange(4)) for _ in xrange(20000)]
+        for address in addresses:
+            expected, found = self.tree.lookup(address), indexed.lookup(address)
+            self.assertEqual((found.country, found.prefix), (expected.country, expected.prefix), address)
+        indexed.close()
+
+    def test_cache_file_reused(self):
+        self.open_indexed().close()
+        # a rebuilt cache file is renamed over the old one
+        inode = os.stat(self.index_file).st_ino
+        indexed = self.open_indexed()
+        self.assertEqual(os.stat(self.index_file).st_ino, inode)
+        self.assertEqual(indexed.lookup('8.8.8.8').country, self.tree.lookup('8.8.8.8').country)
+        indexed.close()
+
+    def test_truncated_cache_file_rebuilt(self):
+        self.open_indexed().close()
+        size = os.path.getsize(self.index_file)
+        with open(self.index_file, 'r+b') as fp:
+            fp.truncate(size - 100)
+        inode = os.stat(self.index_file).st_ino
+        indexed = self.open_indexed()
+        self.assertEqual(os.path.getsize(self.index_file), size)
+        self.assertNotEqual(os.stat(self.index_file).st_ino, inode)
+        self.assertEqual(indexed.lookup('8.8.8.8').country, self.tree.lookup('8.8.8.8').country)
+        indexed.close()
+
+    def test_read_only_directory(self):
+        os.chmod(self.directory, 0o500)
+        try:
+            indexed = self.open_indexed()
+        finally:
+            os.chmod(self.directory, 0o700)
+        if os.path.exists(self.index_file):
+            # the directory is writable anyway, e.g. for root
+            indexed.close()
+            return
+        # the tree is walked without the cache file
+        self.assertTrue(indexed.index is None)
+        self.assertEqual(indexed.lookup('8.8.8.8').country, self.tree.lookup('8.8.8.8').country)
+        indexed.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Tests of lib/rcon.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import time
+import socket
+import unittest
+
+from threading import Thread
+from lib.rcon import Rcon
+
+
+PREFIX = '\xff\xff\xff\xff'
+
+
+class CoalesceTest(unittest.TestCase):
+    """
+    merged say and tell commands sent to a local UDP socket in place of the server
+    """
+
+    password = 'secret'
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(5)
+        self.rcon = Rcon('127.0.0.1', self.server.getsockname()[1], self.password, rate=0, coalesce=True)
+        self.rcon.live = True
+
+    def tearDown(self):
+        # wait until the processor thread has sent the last command
+        with self.rcon.rcon_lock:
+            self.rcon.live = False
+        # let it block on the empty queue, a daemon thread running at interpreter shutdown fails on Python 2
+        time.sleep(.1)
+        self.server.close()
+
+    def receive(self):
+        """
+        receive the next RCON command and answer it like the server, return the packet without prefix and newline
+        """
+        data, address = self.server.recvfrom(8192)
+        self.server.sendto('%sprint\n' % PREFIX, address)
+        self.assertTrue(data.startswith(PREFIX) and data.endswith('\n'))
+        return data[len(PREFIX):-1]
+
+    def test_batch_fits_command_line(self):
+        """
+        the server reads at most MAX_STRING_CHARS - 1 (1023) characters of the command line including the password
+        """
+        # 11 commands of 91 characters merged take 1011 characters, 1025 with 'rcon "secret" '
+        commands = ['say %03d %s' % (num, 'x' * 83) for num in xrange(25)]
+        with self.rcon.rcon_lock:
+            # the processor thread takes the first command and waits for the lock, the others are queued meanwhile
+            self.rcon.push('say first')
+            start = time.time()
+            while not self.rcon.queue.empty() and time.time() - start < 5:
+                time.sleep(.01)
+            for command in commands:
+                self.rcon.push(command)
+        self.assertEqual(self.receive(), 'rcon "%s" say first' % self.password)
+        sent = []
+        while len(sent) < len(commands):
+            packet = self.receive()
+            self.assertTrue(packet.startswith('rcon "%s" ' % self.password))
+            self.assertTrue(len(packet) <= 1023, 'packet of %d characters' % len(packet))
+            batch = packet[len('rcon "%s" ' % self.password):].split(';')
+            if len(sent) + len(batch) < len(commands):
+                # filled up to the limit, the next command does not fit anymore
+                self.assertTrue(len(packet) + 1 + len(commands[len(sent) + len(batch)]) > 1023)
+            sent.extend(batch)
+        self.assertEqual(sent, commands)
+
+
+class RateLimitTest(unittest.TestCase):
+    """
+    packets of queued commands and CVAR queries received by a local UDP socket in place of the server
+    """
+
+    rate = 10
+    burst = 2
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(.1)
+        self.arrivals = []
+        self.running = True
+        self.answering = Thread(target=self.answer)
+        self.answering.start()
+        self.rcon = Rcon('127.0.0.1', self.server.getsockname()[1], 'secret', rate=self.rate, burst=self.burst)
+        self.rcon.live = True
+
+    def tearDown(self):
+        with self.rcon.rcon_lock:
+            self.rcon.live = False
+        time.sleep(.1)
+        self.running = False
+        self.answering.join()
+        self.server.close()
+
+    def answer(self):
+        """
+        answer every command like the server, a command is answered as CVAR query
+        """
+        while self.running:
+            try:
+                data, address = self.server.recvfrom(8192)
+            except socket.timeout:
+                continue
+            self.arrivals.append(time.time())
+            command = data[len(PREFIX):-1].split(' ', 2)[2]
+            self.server.sendto('%sprint\n"%s" is:"1^7" default:"0^7"\n' % (PREFIX, command), address)
+
+    def test_all_packets_paced(self):
+        """
+        queued commands and CVAR queries share the token bucket
+        """
+        self.rcon.push('say hello')
+        self.assertEqual(self.rcon.get_cvars('g_gear', 'g_gravity', 'timelimit'), {'g_gear': '1', 'g_gravity': '1', 'timelimit': '1'})
+        start = time.time()
+        while len(self.arrivals) < 4 and time.time() - start < 5:
+            time.sleep(.01)
+        self.assertEqual(len(self.arrivals), 4)
+        for num, arrival in enumerate(self.arrivals):
+            # a burst of packets, then one packet per interval
+            self.assertTrue(arrival - self.arrivals[0] >= (num - self.burst + 1) / float(self.rate) - .02)
+
+
+if __name__ == '__main__':
+    unittest.main()
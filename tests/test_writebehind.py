@@ -0,0 +1,130 @@
+"""
+Tests of lib/writebehind.py
+
+Run from the root directory of Spunky Bot:
+python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import shutil
+import logging
+import sqlite3
+import tempfile
+import unittest
+import subprocess
+
+from lib.writebehind import WriteBehind
+
+
+# the failed statements are logged
+logging.getLogger('spunkybot').addHandler(logging.NullHandler())
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# writes two transactions and is killed before the second one is committed
+CRASH_SCRIPT = """
+import os
+import sys
+from lib.writebehind import WriteBehind
+conn = WriteBehind(sys.argv[1], delay=60)
+curs = conn.cursor()
+for num in xrange(100):
+    curs.execute("INSERT INTO stats (id, kills) VALUES (?,?)", (num, num))
+curs.execute("UPDATE stats SET kills = kills + 1000 WHERE id < 50")
+conn.flush()
+curs.execute("UPDATE stats SET kills = 0")
+curs.execute("DELETE FROM stats WHERE id >= 50")
+curs.execute("SELECT COUNT(*) FROM stats")
+assert curs.fetchone()[0] == 50
+os._exit(1)
+"""
+
+
+class WriteBehindTest(unittest.TestCase):
+    """
+    database file in a temporary directory, read with a second connection
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'data.sqlite')
+        reader = sqlite3.connect(self.database)
+        reader.execute('CREATE TABLE stats (id INTEGER PRIMARY KEY NOT NULL, kills INTEGER)')
+        reader.commit()
+        reader.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def committed(self, sql="SELECT id, kills FROM stats ORDER BY id"):
+        """
+        rows of the query seen by another connection, i.e. the committed rows
+        """
+        reader = sqlite3.connect(self.database)
+        try:
+            return reader.execute(sql).fetchall()
+        finally:
+            reader.close()
+
+    def test_read_own_writes(self):
+        conn = WriteBehind(self.database, delay=2)
+        curs = conn.cursor()
+        curs.execute("INSERT INTO stats (id, kills) VALUES (1, 5)")
+        curs.execute("UPDATE stats SET kills = kills + 1 WHERE id = 1")
+        self.assertEqual(curs.execute("SELECT kills FROM stats WHERE id = 1").fetchone(), (6,))
+        self.assertEqual(self.committed(), [])
+        conn.close()
+        self.assertEqual(self.committed(), [(1, 6)])
+
+    def test_flush_in_order(self):
+        conn = WriteBehind(self.database, delay=2)
+        curs = conn.cursor()
+        curs.execute("INSERT INTO stats (id, kills) VALUES (1, 1)")
+        curs.execute("INSERT INTO stats (id, kills) VALUES (2, 2)")
+        curs.execute("UPDATE stats SET kills = kills * 10")
+        curs.execute("DELETE FROM stats WHERE id = 1")
+        curs.execute("INSERT INTO stats (id, kills) VALUES (1, 3)")
+        conn.flush()
+        self.assertEqual(self.committed(), [(1, 3), (2, 20)])
+        self.assertEqual(conn.get_stats(), (5, 1))
+        conn.close()
+
+    def test_writer_thread_commits_batch(self):
+        conn = WriteBehind(self.database, delay=.2)
+        curs = conn.cursor()
+        for num in xrange(10):
+            curs.execute("INSERT INTO stats (id, kills) VALUES (?,?)", (num, num))
+        conn.commit()
+        self.assertEqual(curs.lastrowid, 9)
+        for _ in xrange(100):
+            if self.committed("SELECT COUNT(*) FROM stats") == [(10,)]:
+                break
+            conn.writer.join(.05)
+        self.assertEqual(self.committed("SELECT COUNT(*) FROM stats"), [(10,)])
+        # the statements queued within the delay are committed in one transaction
+        self.assertEqual(conn.get_stats(), (10, 1))
+        conn.close()
+
+    def test_failed_statement_skipped(self):
+        conn = WriteBehind(self.database, delay=2)
+        curs = conn.cursor()
+        curs.execute("INSERT INTO stats (id, kills) VALUES (1, 1)")
+        curs.execute("INSERT INTO stats (id, kills) VALUES (1, 2)")
+        curs.execute("INSERT INTO stats (id, kills) VALUES (2, 2)")
+        conn.close()
+        self.assertEqual(self.committed(), [(1, 1), (2, 2)])
+
+    def test_crash_keeps_committed_transactions(self):
+        process = subprocess.Popen([sys.executable, '-c', CRASH_SCRIPT, self.database], cwd=ROOT)
+        self.assertEqual(process.wait(), 1)
+        # the flushed transaction is complete, nothing of the statements queued afterwards is in the database
+        self.assertEqual(self.committed("PRAGMA integrity_check"), [('ok',)])
+        rows = self.committed()
+        self.assertEqual(len(rows), 100)
+        self.assertEqual(rows[:50], [(num, num + 1000) for num in xrange(50)])
+        self.assertEqual(rows[50:], [(num, num) for num in xrange(50, 100)])
+
+
+if __name__ == '__main__':
+    unittest.main()
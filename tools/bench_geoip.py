@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the GeoIP country lookup over a sample of random IP addresses
+
+The previous implementation, which wrapped the database in a new StringIO
+for every lookup, is measured for comparison. The database is also measured
+in mmap mode and with the compiled country index, which is built in a
+temporary directory. All variants are checked to return the same country for
+every address of the sample.
+
+Usage: python tools/bench_geoip.py [<number of addresses>]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from cStringIO import StringIO
+
+HOME = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, HOME)
+
+import lib.pygeoip as pygeoip
+
+
+def legacy_seek_record(database, ipnum):
+    """
+    _seek_record before the database buffer was indexed directly
+    """
+    fp = StringIO(database.cache)
+    offset = 0
+    for depth in range(31, -1, -1):
+        fp.seek(database.record_length * 2 * offset)
+        buf = map(ord, fp.read(database.record_length * 2))
+        branch = int(bool(ipnum & (1 << depth)))
+        offset = 3 * branch
+        x = buf[offset] | (buf[offset + 1] << 8) | (buf[offset + 2] << 16)
+        if x >= database.segments[0]:
+            return 32 - depth, x
+        offset = x
+
+
+def legacy_lookup(database, ip):
+    """
+    country lookup before the database buffer was indexed directly
+    """
+    ipnum = pygeoip.addr_to_num(ip)
+    prefix, num = legacy_seek_record(database, ipnum)
+    num -= pygeoip.COUNTRY_BEGIN
+    return pygeoip.AddressInfo(country_id=num - 1 if num else None, ip=ip, ipnum=ipnum, prefix=prefix)
+
+
+def measure(func, addresses):
+    """
+    return the number of lookups per second and the list of countries
+    """
+    start = time.time()
+    countries = [func(ip).country for ip in addresses]
+    return len(addresses) / (time.time() - start), countries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rand = random.Random(42)
+    addresses = ['%d.%d.%d.%d' % (rand.randint(1, 223), rand.randint(0, 255), rand.randint(0, 255), rand.randint(1, 254)) for _ in xrange(count)]
+
+    start = time.time()
+    database = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'))
+    load_time = time.time() - start
+    start = time.time()
+    mapped_database = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'), use_mmap=True)
+    mmap_load_time = time.time() - start
+    # the cache file of the bot next to GeoIP.dat is left alone
+    index_dir = tempfile.mkdtemp()
+    index_file = os.path.join(index_dir, 'GeoIP.dat.idx')
+    try:
+        start = time.time()
+        indexed_database = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'), use_index=True, index_filename=index_file)
+        index_build_time = time.time() - start
+        indexed_database.close()
+        start = time.time()
+        indexed_database = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'), use_index=True, index_filename=index_file)
+        index_load_time = time.time() - start
+
+        before, legacy_countries = measure(lambda ip: legacy_lookup(database, ip), addresses)
+        after, countries = measure(database.lookup, addresses)
+        mapped, mapped_countries = measure(mapped_database.lookup, addresses)
+        indexed, indexed_countries = measure(indexed_database.lookup, addresses)
+        ranges = indexed_database.index.count
+        indexed_database.close()
+    finally:
+        shutil.rmtree(index_dir)
+    print "Addresses             : %d" % count
+    print "Load time (read)      : %10.1f ms" % (load_time * 1000)
+    print "Load time (mmap)      : %10.1f ms" % (mmap_load_time * 1000)
+    print "Index build time      : %10.1f ms" % (index_build_time * 1000)
+    print "Index load time       : %10.1f ms (%d ranges)" % (index_load_time * 1000, ranges)
+    print "Before (StringIO)     : %10.0f lookups/s" % before
+    print "After (direct index)  : %10.0f lookups/s" % after
+    print "After (mmap)          : %10.0f lookups/s" % mapped
+    print "After (index)         : %10.0f lookups/s" % indexed
+    print "Speed-up              : %10.2fx (index: %.2fx)" % (after / before, indexed / before)
+    print "Identical results     : %s" % (countries == legacy_countries == mapped_countries == indexed_countries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark of the log line dispatch of LogParser.parse_line
+
+The previous implementation, which rebuilt the dispatch dictionary for
+every line, is measured for comparison. Both implementations do the same
+work in each measurement:
+- dispatch: the handlers are no-ops, so only the cost of splitting the
+  line and finding the handler is measured
+- dispatch and fields: the Hit and Kill handlers read the numeric fields,
+  the previous handlers with split() and int(), the current ones from the
+  LogEvent
+
+Usage: python tools/bench_parse_line.py [<games.log>] [<repetitions per round>]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import spunky
+
+
+# typical mix of a busy server with g_loghits enabled
+SAMPLE_LINES = ['  3:12 Hit: 2 4 1 8: Player2 hit Player4 in the Helmet',
+                '  3:12 Hit: 4 2 5 19: Player4 hit Player2 in the Left Arm',
+                '  3:12 Hit: 2 4 3 8: Player2 hit Player4 in the Torso',
+                '  3:12 Kill: 2 4 19: Player2 killed Player4 by UT_MOD_LR300',
+                '  3:13 Item: 2 ut_weapon_lr',
+                '  3:13 say: 2 Player2: nice shot',
+                '  3:14 ClientUserinfoChanged: 2 n\\Player2\\t\\1\\r\\0\\tl\\0\\f0\\\\f1\\\\f2\\\\a0\\0\\a1\\0\\a2\\0',
+                '  3:15 Flag: 2 1: team_CTF_redflag',
+                '  3:16 Bomb was planted by 2!',
+                '  3:17 Pop!']
+
+HANDLERS = ['new_game', 'handle_warmup', 'handle_initround', 'handle_exit', 'handle_say', 'handle_saytell',
+            'handle_userinfo', 'handle_userinfo_changed', 'handle_begin', 'handle_disconnect',
+            'handle_teams_ts_mode', 'handle_kill', 'handle_hit', 'handle_freeze', 'handle_thawout',
+            'handle_flag', 'handle_flagcapturetime', 'handle_bomb', 'handle_bomb_exploded']
+
+
+def noop(self, line):
+    """
+    handler doing nothing
+    """
+    pass
+
+
+class BenchParser(spunky.LogParser):
+    """
+    LogParser without configuration, game and handlers
+    """
+    def __init__(self):
+        self.build_dispatch_table()
+
+    def legacy_parse_line(self, string):
+        """
+        parse_line before the dispatch table was built once at construction
+        """
+        line = string[7:]
+        tmp = line.split(":", 1)
+        line = tmp[1].strip() if len(tmp) > 1 else tmp[0].strip()
+        option = {'InitGame': self.new_game, 'Warmup': self.handle_warmup, 'InitRound': self.handle_initround,
+                  'Exit': self.handle_exit, 'say': self.handle_say, 'saytell': self.handle_saytell,
+                  'ClientUserinfo': self.handle_userinfo, 'ClientUserinfoChanged': self.handle_userinfo_changed,
+                  'ClientBegin': self.handle_begin, 'ClientDisconnect': self.handle_disconnect,
+                  'SurvivorWinner': self.handle_teams_ts_mode, 'Kill': self.handle_kill, 'Hit': self.handle_hit,
+                  'Freeze': self.handle_freeze, 'ThawOutFinished': self.handle_thawout,
+                  'Flag': self.handle_flag, 'FlagCaptureTime': self.handle_flagcapturetime}
+        try:
+            if tmp:
+                action = tmp[0].strip()
+                if action in option:
+                    option[action](line)
+                elif 'Bomb' in action:
+                    self.handle_bomb(line)
+                elif 'Pop' in action:
+                    self.handle_bomb_exploded(line)
+        except (IndexError, KeyError):
+            pass
+
+
+for handler_name in HANDLERS:
+    setattr(BenchParser, handler_name, noop)
+
+
+class LegacyFieldsParser(BenchParser):
+    """
+    previous Hit and Kill handlers reading the numeric fields of the line
+    """
+    def handle_hit(self, line):
+        info = line.split(":", 1)[0].split()
+        return int(info[1]), int(info[0]), int(info[2]), int(info[3])
+
+    def handle_kill(self, line):
+        parts = line.split(":", 1)
+        info = parts[0].split()
+        k_name = parts[1].split()[0]
+        return int(info[0]), int(info[1]), int(info[2]), k_name == "<non-client>"
+
+
+class FieldsParser(BenchParser):
+    """
+    current Hit and Kill handlers reading the numeric fields of the LogEvent
+    """
+    def handle_hit(self, event):
+        info = event.numbers
+        return info[1], info[0], info[2], info[3]
+
+    def handle_kill(self, event):
+        info = event.numbers
+        return info[0], info[1], info[2], event.payload.startswith("<non-client> ")
+
+
+def measure(funcs, lines, repetitions, rounds=5):
+    """
+    return the number of lines per second processed by each function
+
+    The functions are measured in turns and the best round of each is taken,
+    so a busy moment of the machine does not favour one of them.
+    """
+    best = [None] * len(funcs)
+    for _ in xrange(rounds):
+        for index, func in enumerate(funcs):
+            start = time.time()
+            for _ in xrange(repetitions):
+                for line in lines:
+                    func(line)
+            elapsed = time.time() - start
+            if best[index] is None or elapsed < best[index]:
+                best[index] = elapsed
+    return [len(lines) * repetitions / seconds for seconds in best]
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as log_file:
+            lines = [line.rstrip('\n') for line in log_file if line.strip()]
+    else:
+        lines = SAMPLE_LINES
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else max(50000 / len(lines), 1)
+
+    parser = BenchParser()
+    before, after, fields_before, fields_after = measure([parser.legacy_parse_line, parser.parse_line,
+                                                          LegacyFieldsParser().legacy_parse_line,
+                                                          FieldsParser().parse_line], lines, repetitions)
+    print "Lines per repetition  : %d" % len(lines)
+    print "Repetitions per round : %d" % repetitions
+    print "Dispatch"
+    print "  Before (per-line dict): %10.0f lines/s" % before
+    print "  After (dispatch table): %10.0f lines/s" % after
+    print "  Speed-up              : %10.2fx" % (after / before)
+    print "Dispatch and fields"
+    print "  Before (split, int)   : %10.0f lines/s" % fields_before
+    print "  After (LogEvent)      : %10.0f lines/s" % fields_after
+    print "  Speed-up              : %10.2fx" % (fields_after / fields_before)
+
+
+if __name__ == '__main__':
+    main()
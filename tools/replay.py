@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline replay of a recorded games.log through LogParser and all handlers
+
+No game server, RCON socket or database file is needed: the RCON commands
+are counted by a stub instead of being sent, the database is kept in memory
+and the scheduled tasks are not started. The log file is read from the
+beginning as fast as possible and a report of the throughput, the time spent
+in each handler and the peak memory usage is printed at the end.
+
+Usage: python tools/replay.py <games.log> [<settings.conf>]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import resource
+import ConfigParser
+
+HOME = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, HOME)
+
+import spunky
+import lib.pygeoip as pygeoip
+import lib.migration as migration
+from lib.logtail import LogTail
+from lib.writebehind import WriteBehind
+
+
+class ReplayQuake(object):
+    """
+    Quake3 query stub without connected players
+    """
+    def __init__(self):
+        self.players = []
+        self.values = {}
+
+    def rcon_update(self):
+        """
+        nothing to update
+        """
+        pass
+
+
+class ReplayRcon(object):
+    """
+    RCON stub counting the commands instead of sending them
+    """
+    def __init__(self, *args, **kwargs):
+        self.live = False
+        self.quake = ReplayQuake()
+        self.commands = 0
+        self.command_bytes = 0
+
+    def push(self, msg):
+        """
+        count RCON command
+        """
+        if self.live:
+            self.commands += 1
+            self.command_bytes += len(msg)
+
+    def go_live(self):
+        """
+        go live
+        """
+        self.live = True
+
+    def get_status(self):
+        """
+        count status request
+        """
+        self.push('status')
+
+    def get_quake_value(self, value):
+        """
+        no server values available
+        """
+        return self.quake.values[value]
+
+    def get_rcon_output(self, value):
+        """
+        empty RCON output
+        """
+        return 'print', ''
+
+    def get_cvar(self, value):
+        """
+        no CVAR values available
+        """
+        return None
+
+    def get_cvars(self, *names, **kwargs):
+        """
+        no CVAR values available
+        """
+        return dict.fromkeys(names)
+
+    def get_mapcycle_path(self):
+        """
+        empty mapcycle
+        """
+        return []
+
+    def clear(self):
+        """
+        nothing to clear
+        """
+        pass
+
+
+class ReplayParser(spunky.LogParser):
+    """
+    LogParser replaying the whole game log instead of following it
+    """
+    def read_log(self):
+        """
+        parse the game log from the beginning to the end and measure the handlers
+        """
+        self.find_game_start()
+        self.log_file.close()
+        self.game = spunky.Game(self.config_file, self.urt42_modversion)
+        self.game.go_live()
+
+        self.handler_calls = {}
+        self.handler_time = {}
+        for table in (self.dispatch, self.dispatch_prefix):
+            for action, handler in table.items():
+                table[action] = self.timed(handler)
+
+        # LogTail starts at the beginning of the file
+        log_tail = LogTail(self.log_tail.filename)
+        parse_line = self.parse_line
+        self.num_lines = 0
+        start = time.time()
+        while 1:
+            lines = log_tail.read_lines()
+            if not lines and not log_tail.get_backlog():
+                break
+            for line in lines:
+                parse_line(line)
+            self.num_lines += len(lines)
+        self.elapsed = time.time() - start
+
+    def timed(self, handler):
+        """
+        wrap handler to count the calls and the time spent in it
+        """
+        name = handler.__name__
+        self.handler_calls[name] = 0
+        self.handler_time[name] = 0.0
+        calls = self.handler_calls
+        spent = self.handler_time
+        clock = time.time
+
+        def wrapper(event):
+            begin = clock()
+            try:
+                handler(event)
+            finally:
+                spent[name] += clock() - begin
+                calls[name] += 1
+        wrapper.__name__ = name
+        return wrapper
+
+
+def peak_memory():
+    """
+    get the peak resident set size of the process in MB
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on Mac OS X and in kilobytes on Linux
+    return max_rss / (1048576.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def write_config(games_log, settings):
+    """
+    write a copy of the bot configuration for the replay and return its path
+    """
+    config = ConfigParser.ConfigParser()
+    config.read(settings)
+    for section in ('server', 'rules', 'bot'):
+        if not config.has_section(section):
+            config.add_section(section)
+    config.set('server', 'log_file', os.path.abspath(games_log))
+    for option in ('server_ip', 'server_port', 'rcon_password'):
+        if not config.has_option('server', option):
+            config.set('server', option, '')
+    config.set('rules', 'show_rules', 'False')
+    config.set('bot', 'verbose', 'False')
+    handle, path = tempfile.mkstemp(suffix='.conf')
+    with os.fdopen(handle, 'w') as config_file:
+        config.write(config_file)
+    return path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print __doc__.strip().splitlines()[-1]
+        sys.exit(1)
+    games_log = sys.argv[1]
+    settings = sys.argv[2] if len(sys.argv) > 2 else os.path.join(HOME, 'conf', 'settings.conf')
+
+    spunky.home_path = tempfile.mkdtemp()
+    spunky.GEOIP = pygeoip.Database(os.path.join(HOME, 'lib', 'GeoIP.dat'), use_mmap=True, use_index=True)
+    spunky.conn = WriteBehind(':memory:')
+    spunky.curs = spunky.conn.cursor()
+    migration.migrate(spunky.conn.connection)
+    spunky.BAN_INDEX.load(spunky.curs, time.strftime("%Y-%m-%d %H:%M:%S"))
+    spunky.LEADERBOARD.load(spunky.curs)
+    spunky.Rcon = ReplayRcon
+
+    config_file = write_config(games_log, settings)
+    try:
+        memory_before = peak_memory()
+        parser = ReplayParser(config_file)
+        parser.read_log()
+    finally:
+        os.remove(config_file)
+    rcon = parser.game.get_rcon_handle()
+    events = sum(parser.handler_calls.itervalues())
+    elapsed = max(parser.elapsed, 1e-9)
+
+    print
+    print "Lines         : %10d   %10.0f lines/s" % (parser.num_lines, parser.num_lines / elapsed)
+    print "Events        : %10d   %10.0f events/s" % (events, events / elapsed)
+    print "Elapsed       : %10.3f s" % parser.elapsed
+    print "RCON commands : %10d   %10d bytes" % (rcon.commands, rcon.command_bytes)
+    print "Peak memory   : %10.1f MB  (%.1f MB before replay)" % (peak_memory(), memory_before)
+    print "GeoIP cache   : %10d hits %5d misses" % spunky.COUNTRY_CACHE.get_stats()[:2]
+    spunky.conn.flush()
+    print "Database      : %10d statements in %d transactions" % spunky.conn.get_stats()
+    print "Ban index     : %10d active bans" % len(spunky.BAN_INDEX)
+    print
+    print "%-26s %10s %12s %10s %7s" % ("Handler", "Calls", "Total ms", "us/call", "Share")
+    total = max(sum(parser.handler_time.itervalues()), 1e-9)
+    for name, spent in sorted(parser.handler_time.iteritems(), key=lambda item: item[1], reverse=True):
+        calls = parser.handler_calls[name]
+        if calls:
+            print "%-26s %10d %12.1f %10.1f %6.1f%%" % (name, calls, spent * 1000, spent * 1000000 / calls, spent * 100 / total)
+
+    spunky.conn.close()
+    shutil.rmtree(spunky.home_path)
+
+
+if __name__ == '__main__':
+    main()